@@ -2,7 +2,7 @@ import argparse
 from pathlib import Path
 
 from .storage import Storage
-from .mcp_server import app
+from .mcp_server import make_app
 
 
 def main():
@@ -12,8 +12,7 @@ def main():
     )
     args = parser.parse_args()
 
-    app.storage = Storage(args.dir)
-    app.run()
+    make_app(Storage(args.dir)).run()
 
 
 if __name__ == '__main__':
@@ -1,6 +1,12 @@
+import asyncio
+import threading
 from typing import List, Optional
 from pydantic import BaseModel
 from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.dependencies import get_context
+
+from .storage import Storage
 
 
 class NoteInfo(BaseModel):
@@ -11,11 +17,44 @@ class NoteInfo(BaseModel):
     descendant_count: Optional[int] = None
 
 
-app = FastMCP(name='Notes')
+class NoteMove(BaseModel):
+    filename: str
+    target_folder: Optional[str] = None
+
+
+# Storage keeps in-memory caches and batch state, so calls into it are
+# serialized even though they run off the event loop
+_storage_lock = threading.Lock()
+
+
+async def run_storage(method_name: str, *args, **kwargs):
+    """Call a method on the current server's storage in a worker thread.
+
+    The method is looked up by name on the storage object, so overrides in a
+    Storage subclass are used. The call runs inside a storage batch so its
+    index writes are coalesced.
+    """
+    storage = get_context().fastmcp.storage
+    method = getattr(storage, method_name)
+
+    def call():
+        with _storage_lock, storage.batch():
+            return method(*args, **kwargs)
+
+    return await asyncio.to_thread(call)
+
+
+class NoteNotFoundError(ToolError):
+    """A tool was given the filename of a note that doesn't exist."""
+
+
+def raise_if_missing(found: bool, filename: str) -> None:
+    """Raise the tool error for a note that storage couldn't find."""
+    if not found:
+        raise NoteNotFoundError(f"Note '{filename}' not found")
 
 
-@app.tool
-def add_note(
+async def add_note(
     title: str, content: str, tags: List[str] = None, parent: str = None
 ) -> str:
     """Add a new note with title, content and tags.
@@ -43,12 +82,11 @@ def add_note(
     if tags is None:
         tags = []
 
-    note_path = app.storage.add_note(title, content, tags, parent)
+    note_path = await run_storage('add_note', title, content, tags, parent)
     return f"Note '{title}' created at {note_path.name}"
 
 
-@app.tool
-def get_note(filename: str) -> str:
+async def get_note(filename: str) -> str:
     """Retrieve a note by filename, including hierarchical notes.
 
     Args:
@@ -65,15 +103,12 @@ def get_note(filename: str) -> str:
         - get_note("project_alpha/meeting_notes.md") - retrieves child note
         - get_note("project_alpha/research/market_analysis.md") - retrieves deeply nested note
     """
-    content = app.storage.get_note(filename=filename)
-    if content is None:
-        raise ValueError(f"Note '{filename}' not found")
-
+    content = await run_storage('get_note', filename=filename)
+    raise_if_missing(content is not None, filename)
     return content
 
 
-@app.tool
-def list_notes(parent: str = None) -> List[NoteInfo]:
+async def list_notes(parent: str = None) -> List[NoteInfo]:
     """List notes at a specific level of the hierarchy.
 
     Args:
@@ -94,12 +129,12 @@ def list_notes(parent: str = None) -> List[NoteInfo]:
     Note: To explore the full hierarchy, call list_notes() for top-level, then call list_notes(parent="...")
           for each parent you want to explore further.
     """
-    notes_data = app.storage.list_notes(parent)
-    return [NoteInfo(**note) for note in notes_data]
+    notes_data = await run_storage('list_notes', parent)
+    # Storage builds these rows itself, so they don't need validating again
+    return [NoteInfo.model_construct(**note) for note in notes_data]
 
 
-@app.tool
-def delete_note(filename: str) -> str:
+async def delete_note(filename: str) -> str:
     """Delete a note by filename with automatic cleanup of empty directories.
 
     Args:
@@ -121,15 +156,13 @@ def delete_note(filename: str) -> str:
         - delete_note("project_alpha/meeting_notes.md") - deletes child note, may clean up project_alpha/ if empty
         - delete_note("project_alpha/research/market_analysis.md") - deletes deeply nested note
     """
-    success = app.storage.delete_note(filename=filename)
-    if not success:
-        raise ValueError(f"Note '{filename}' not found")
+    success = await run_storage('delete_note', filename=filename)
+    raise_if_missing(success, filename)
 
     return f"Note '{filename}' deleted"
 
 
-@app.tool
-def update_note(filename: str, content: str, tags: List[str] = None) -> str:
+async def update_note(filename: str, content: str, tags: List[str] = None) -> str:
     """Update an existing note's content and tags by filename.
 
     Args:
@@ -156,15 +189,15 @@ def update_note(filename: str, content: str, tags: List[str] = None) -> str:
     if tags is None:
         tags = []
 
-    success = app.storage.update_note(filename=filename, content=content, tags=tags)
-    if not success:
-        raise ValueError(f"Note '{filename}' not found")
+    success = await run_storage(
+        'update_note', filename=filename, content=content, tags=tags
+    )
+    raise_if_missing(success, filename)
 
     return f"Note '{filename}' updated"
 
 
-@app.tool
-def move_note(filename: str, target_folder: Optional[str] = None) -> str:
+async def move_note(filename: str, target_folder: Optional[str] = None) -> str:
     """Move a note to a different folder and update all references.
 
     Args:
@@ -198,14 +231,53 @@ def move_note(filename: str, target_folder: Optional[str] = None) -> str:
     if target_folder is not None and target_folder.strip() == '':
         target_folder = None
 
-    new_filename = app.storage.move_note(filename=filename, target_folder=target_folder)
+    new_filename = await run_storage(
+        'move_note', filename=filename, target_folder=target_folder
+    )
 
     target_desc = f"to '{target_folder}/'" if target_folder else 'to root directory'
     return f"Note '{filename}' moved {target_desc} as '{new_filename}'"
 
 
-@app.tool
-def add_tags(filename: str, tags: List[str]) -> str:
+async def move_notes(moves: List[NoteMove]) -> str:
+    """Move several notes at once and update all references to them.
+
+    Args:
+        moves: Notes to move, each with a filename and a target_folder
+               (None or empty string for the root directory). Moves are
+               applied in order.
+
+    Returns:
+        Success message listing the new filename of each moved note
+
+    Behavior:
+        - Moves each note like move_note does
+        - Updates references to all moved notes in a single pass over the notes
+        - If a move fails, the moves before it are kept and references to
+          them are still updated
+
+    Examples:
+        - move_notes([{"filename": "a.md", "target_folder": "archive"},
+                      {"filename": "b.md", "target_folder": "archive"}])
+    """
+    # Convert empty strings to None for consistency
+    pairs = []
+    for move in moves:
+        target_folder = move.target_folder
+        if target_folder is not None and target_folder.strip() == '':
+            target_folder = None
+        pairs.append((move.filename, target_folder))
+
+    new_filenames = await run_storage('move_notes', pairs)
+
+    moved = ', '.join(
+        f"'{filename}' as '{new_filename}'"
+        for (filename, _), new_filename in zip(pairs, new_filenames)
+    )
+    return f'Moved notes: {moved}'
+
+
+async def add_tags(filename: str, tags: List[str]) -> str:
     """Add new tags to an existing note.
 
     Args:
@@ -228,16 +300,14 @@ def add_tags(filename: str, tags: List[str]) -> str:
         - add_tags("project.md", ["urgent", "review"]) - adds tags to top-level note
         - add_tags("project/task.md", ["completed"]) - adds tag to nested note
     """
-    success = app.storage.add_tags(filename=filename, tags_to_add=tags)
-    if not success:
-        raise ValueError(f"Note '{filename}' not found")
+    success = await run_storage('add_tags', filename=filename, tags_to_add=tags)
+    raise_if_missing(success, filename)
 
     tags_str = ', '.join(tags)
     return f"Tags '{tags_str}' added to note '{filename}'"
 
 
-@app.tool
-def remove_tags(filename: str, tags: List[str]) -> str:
+async def remove_tags(filename: str, tags: List[str]) -> str:
     """Remove specified tags from an existing note.
 
     Args:
@@ -261,9 +331,36 @@ def remove_tags(filename: str, tags: List[str]) -> str:
         - remove_tags("project.md", ["urgent"]) - removes tag from top-level note
         - remove_tags("project/task.md", ["draft", "review"]) - removes multiple tags from nested note
     """
-    success = app.storage.remove_tags(filename=filename, tags_to_remove=tags)
-    if not success:
-        raise ValueError(f"Note '{filename}' not found")
+    success = await run_storage('remove_tags', filename=filename, tags_to_remove=tags)
+    raise_if_missing(success, filename)
 
     tags_str = ', '.join(tags)
     return f"Tags '{tags_str}' removed from note '{filename}'"
+
+
+TOOLS = [
+    add_note,
+    get_note,
+    list_notes,
+    delete_note,
+    update_note,
+    move_note,
+    move_notes,
+    add_tags,
+    remove_tags,
+]
+
+
+def make_app(storage: Optional[Storage] = None) -> FastMCP:
+    """Create a notes server with all tools, backed by storage.
+
+    The storage can also be assigned to the server's storage attribute later.
+    """
+    app = FastMCP(name='Notes')
+    app.storage = storage
+    for tool in TOOLS:
+        app.tool(tool)
+    return app
+
+
+app = make_app()
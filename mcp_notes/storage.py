@@ -1,28 +1,300 @@
-import json
+import os
 import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, wraps
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Dict, Optional, TextIO
+
+import orjson
+
+# Maximum number of parsed index files kept in memory.
+INDEX_CACHE_SIZE = 4096
+
+# Cached files are validated by (mtime_ns, size), but a same-size rewrite
+# within the filesystem's timestamp granularity keeps both. As in git's racy
+# entry rule, a file whose mtime is this close to the time it was read isn't
+# cached, so it is read again next time. Timestamps come from a coarse kernel
+# clock, and filesystems that only store whole seconds (FAT: two) need more.
+_RACY_NS = 20_000_000
+_RACY_WHOLE_SECONDS_NS = 2_000_000_000
+
+# Maximum total size of note contents kept in memory, in bytes.
+CONTENT_CACHE_BYTES = 32 * 1024 * 1024
+
+# Runs of characters that get replaced with a single underscore in filenames.
+_NON_ALNUM_RUN = re.compile(r'[^a-z0-9]+')
+
+# Maps every byte other than lowercase ASCII letters and digits to an underscore.
+_FILENAME_BYTES = bytes(
+    byte if byte in b'abcdefghijklmnopqrstuvwxyz0123456789' else ord('_')
+    for byte in range(256)
+)
+
+
+def _subtree_size(data: Dict[str, any]) -> int:
+    """Count a note together with its descendants, from its index entry."""
+    return 1 + data.get('descendant-count', 0)
+
+
+def _note_header(title: str, tags: List[str]) -> str:
+    """Format the title and tags lines that start every note."""
+    if not tags:
+        return f'# {title}\nTags: \n\n'
+    return f'# {title}\nTags: {", ".join(tags)}\n\n'
+
+
+def _write_note(f: TextIO, title: str, tags: List[str], content: str) -> None:
+    """Write a note's title and tags header followed by its content.
+
+    The content is written separately so a large note isn't copied into one
+    more string together with its header.
+    """
+    f.write(_note_header(title, tags))
+    f.write(content)
+
+
+def _create_note_file(path: Path) -> TextIO:
+    """Open a new note file for writing, creating its folder if it is missing."""
+    try:
+        return open(path, 'w', encoding='utf-8')
+    except FileNotFoundError:
+        # First note in this folder
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, 'w', encoding='utf-8')
+
+
+def _note_body(text: str) -> str:
+    """Get the content of a note without its title, tags and blank separator lines."""
+    # Skip the title line
+    start = text.find('\n') + 1
+    if not start:
+        return ''
+    if text.startswith('Tags: ', start):
+        # Skip the tags line and the blank line after it, if there is one
+        start = text.find('\n', start) + 1
+        if not start:
+            return ''
+        end = text.find('\n', start)
+        if end < 0:
+            end = len(text)
+        if not text[start:end].strip():
+            start = end + 1
+    return text[start:]
+
+
+def _read_note_file(path: str) -> tuple[str, os.stat_result]:
+    """Read a note's text with a single read, along with the file's stat.
+
+    Notes are small enough to read in one call, which skips the buffered
+    text layer. Line endings are translated like text mode would.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        stat = os.fstat(fd)
+        data = os.read(fd, stat.st_size)
+        # The file may have grown since the stat
+        while chunk := os.read(fd, 65536):
+            data += chunk
+    finally:
+        os.close(fd)
+    text = data.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text, stat
+
+
+def _reference_replacer(replacements: Dict[str, str]) -> Callable[[str], str]:
+    """Build a function that replaces old filenames in a note's text with new ones."""
+    if len(replacements) == 1:
+        ((old_filename, new_filename),) = replacements.items()
+
+        def replace(content: str) -> str:
+            return content.replace(old_filename, new_filename)
+
+        return replace
+
+    # Match all the old filenames in one scan, longest first so that a
+    # filename that is a prefix of another one doesn't hide it
+    pattern = re.compile(
+        '|'.join(map(re.escape, sorted(replacements, key=len, reverse=True)))
+    )
+
+    def replace(content: str) -> str:
+        return pattern.sub(lambda match: replacements[match[0]], content)
+
+    return replace
+
+
+def _is_racy(stat: os.stat_result) -> bool:
+    """Tell whether a file could still change without changing its stamp."""
+    mtime_ns = stat.st_mtime_ns
+    if mtime_ns % 1_000_000_000:
+        window = _RACY_NS
+    else:
+        window = _RACY_WHOLE_SECONDS_NS
+    return time.time_ns() - mtime_ns < window
+
+
+def _intern_tags(tags: List[str]) -> List[str]:
+    """Intern tag strings so that notes sharing a tag share one string object."""
+    return [sys.intern(tag) for tag in tags]
+
+
+@lru_cache(maxsize=4096)
+def _index_dir_for_note(directory: Path, filename: str) -> Optional[Path]:
+    """Get the subdirectory of directory whose index lists the note at filename."""
+    # Handle nested path like "parent_name/child_name.md"
+    parent, _, _ = filename.rpartition('/')
+    return directory / parent if parent else None
+
+
+@lru_cache(maxsize=None)
+def _search_command() -> Optional[List[str]]:
+    """Get the command for listing notes that contain a fixed string, if any.
+
+    ripgrep is preferred, with grep as the fallback. Both print the matching
+    paths separated by NUL bytes and skip __pycache__ like the Python walk.
+    """
+    rg = shutil.which('rg')
+    if rg:
+        return [
+            rg,
+            '--files-with-matches',
+            '--null',
+            '--fixed-strings',
+            '--no-ignore',
+            '--hidden',
+            '--no-messages',
+            '--glob',
+            '*.md',
+            '--glob',
+            '!__pycache__',
+        ]
+    grep = shutil.which('grep')
+    if grep:
+        return [
+            grep,
+            '--recursive',
+            '--files-with-matches',
+            '--null',
+            '--fixed-strings',
+            '--include=*.md',
+            '--exclude-dir=__pycache__',
+        ]
+    return None
+
+
+def _batched(method):
+    """Run a Storage method inside a batch so its index writes are coalesced."""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.batch():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class _CachedIndex:
+    """A parsed index file and data derived from it, valid while stamp matches."""
+
+    __slots__ = ('stamp', 'index', 'by_filename', 'listing')
+
+    def __init__(self, stamp: tuple[int, int], index: Dict[str, Dict[str, any]]):
+        self.stamp = stamp
+        self.index = index
+        # Filename -> title lookup, built on first use
+        self.by_filename: Optional[Dict[str, str]] = None
+        # Rows returned by list_notes, built on first use
+        self.listing: Optional[List[Dict[str, any]]] = None
 
 
 class Storage:
     def __init__(self, directory: Path | str):
         self.directory = Path(directory)
         self.directory.mkdir(parents=True, exist_ok=True)
+        # Note paths are joined as strings, which is cheaper than Path objects
+        self._directory_str = os.fspath(self.directory)
         self.index_file = self.directory / 'notes_index.json'
-
-    def _get_index_path(self, subdirectory: Optional[Path] = None) -> Path:
-        """Get the path to the index file for a given directory."""
+        self._index_file_str = os.fspath(self.index_file)
+        # Parsed indexes keyed by index path, validated by (mtime_ns, size)
+        self._index_cache: OrderedDict[str, _CachedIndex] = OrderedDict()
+        # Note contents keyed by filename, validated by (mtime_ns, size)
+        self._content_cache: OrderedDict[str, tuple[tuple[int, int], str]] = (
+            OrderedDict()
+        )
+        self._content_cache_bytes = 0
+        # Indexes saved inside a batch() and not yet written to disk.
+        self._pending_indexes: Dict[str, Dict] = {}
+        self._batch_depth = 0
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Coalesce index writes until the outermost batch exits.
+
+        Indexes saved inside the batch are kept in memory (and served to later
+        loads) and each modified index file is written once on exit, so several
+        changes to the same directory cost a single write.
+
+        Example:
+            with storage.batch():
+                storage.add_note('Task 1', 'First', [], parent='project')
+                storage.add_note('Task 2', 'Second', [], parent='project')
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write all indexes saved by the current batch to disk."""
+        while self._pending_indexes:
+            index_path, index = self._pending_indexes.popitem()
+            self._write_index(index_path, index)
+
+    def _get_index_path(self, subdirectory: Optional[Path] = None) -> str:
+        """Get the path to the index file for a given directory.
+
+        The result keys the index caches, so subdirectory must always be
+        joined onto self.directory as a Path: a string join would spell the
+        same folder differently for a relative base directory like '.'.
+        """
         if subdirectory is None:
-            return self.index_file
-        return subdirectory / 'notes_index.json'
+            return self._index_file_str
+        return os.path.join(subdirectory, 'notes_index.json')
+
+    @staticmethod
+    def _check_relative_path(path: str) -> None:
+        """Check that a note or folder path stays inside the base directory.
+
+        Raises:
+            ValueError: If the path is absolute or goes up with '..'
+        """
+        if path.startswith('/') or '..' in path.split('/'):
+            raise ValueError(f"Invalid note path '{path}'")
+
+    def _note_path(self, filename: str) -> str:
+        """Get the full path of a note or folder given relative to the base directory.
 
-    def _get_directory_for_note(self, filename: str) -> Path:
-        """Get the directory where a note should be stored based on its filename."""
-        if '/' in filename:
-            # Handle nested path like "parent_name/child_name.md"
-            parent_parts = filename.split('/')[:-1]  # Remove the filename part
-            return self.directory / Path(*parent_parts)
-        return self.directory
+        Raises:
+            ValueError: If the path is absolute or goes up with '..'
+        """
+        self._check_relative_path(filename)
+        return f'{self._directory_str}/{filename}'
+
+    def _get_index_dir(self, filename: str) -> Optional[Path]:
+        """Get the directory whose index lists a note, or None for top-level notes."""
+        return _index_dir_for_note(self.directory, filename)
 
     def _normalize_parent(self, parent: Optional[str]) -> Optional[str]:
         """Normalize parent parameter by removing .md extension if present."""
@@ -33,194 +305,248 @@ class Storage:
             parent = parent[:-3]
         return parent
 
-    def _calculate_children_count(self, note_filename: str) -> int:
-        """Calculate the number of immediate child notes for a given note."""
-        # Remove .md extension to get directory name
-        if note_filename.endswith('.md'):
-            dir_name = note_filename[:-3]
-        else:
-            dir_name = note_filename
-
-        # Handle nested paths - get the full directory path
-        if '/' in dir_name:
-            child_dir = self.directory / dir_name
-        else:
-            child_dir = self.directory / dir_name
-
-        if not child_dir.exists():
-            return 0
+    def _calculate_counts(self, note_filename: str) -> tuple[int, int]:
+        """Calculate the numbers of immediate children and of all descendants of a note.
 
-        # Load the child directory's index
-        child_index = self._load_index(child_dir)
-        return len(child_index)
-
-    def _calculate_descendant_count(self, note_filename: str) -> int:
-        """Calculate the total number of descendant notes recursively."""
+        The children's own stored counts already cover the rest of the subtree,
+        so only the index of the note's folder is read.
+        """
         # Remove .md extension to get directory name
         if note_filename.endswith('.md'):
             dir_name = note_filename[:-3]
         else:
             dir_name = note_filename
 
-        # Handle nested paths - get the full directory path
-        if '/' in dir_name:
-            child_dir = self.directory / dir_name
-        else:
-            child_dir = self.directory / dir_name
-
-        if not child_dir.exists():
-            return 0
-
-        total_count = 0
-        child_index = self._load_index(child_dir)
-
-        # Count immediate children
-        total_count += len(child_index)
-
-        # Recursively count descendants of each child
-        for title, data in child_index.items():
-            child_filename = data['filename']
-            # For nested children, we need to get just the filename part
-            if '/' in child_filename:
-                # Get the relative path from the child directory
-                relative_filename = (
-                    child_filename.split('/', 1)[1]
-                    if '/' in child_filename
-                    else child_filename
-                )
-                full_child_path = f'{dir_name}/{relative_filename}'
-            else:
-                full_child_path = f'{dir_name}/{child_filename}'
-            total_count += self._calculate_descendant_count(full_child_path)
-
-        return total_count
-
-    def _update_parent_counts(self, filename: str, count_delta: int) -> None:
-        """Update children-count and descendant-count for all parents in the hierarchy."""
-        if '/' not in filename:
-            # Top-level note, no parents to update
-            return
-
-        # Get parent path
-        parent_parts = filename.split('/')[:-1]
-
-        # Update counts for each level in the hierarchy
-        current_path = ''
-        for i, part in enumerate(parent_parts):
-            if i == 0:
-                current_path = part
-                parent_dir = self.directory
-            else:
-                current_path = f'{current_path}/{part}'
-                parent_dir = self.directory / '/'.join(parent_parts[:i])
-
-            # Load parent index
-            parent_index = self._load_index(
-                parent_dir if parent_dir != self.directory else None
-            )
-
-            # Find the parent note entry
-            parent_note_name = None
-            for title, data in parent_index.items():
-                expected_filename = (
-                    f'{part}.md' if i == 0 else f'{"/".join(parent_parts[: i + 1])}.md'
-                )
-                if (
-                    data['filename'] == expected_filename
-                    or data['filename'] == f'{part}.md'
-                ):
-                    parent_note_name = title
+        child_index = self._load_index(self.directory / dir_name)
+        descendant_count = sum(_subtree_size(data) for data in child_index.values())
+        return len(child_index), descendant_count
+
+    def _new_entry(self, filename: str, tags: List[str]) -> Dict[str, any]:
+        """Build the index entry of a note, counting notes already under its folder."""
+        entry = {'filename': filename, 'tags': tags}
+        children_count, descendant_count = self._calculate_counts(filename)
+        # Only add count keys if there are children
+        if children_count > 0:
+            entry['children-count'] = children_count
+            entry['descendant-count'] = descendant_count
+        return entry
+
+    def _update_parent_counts(self, *changes: tuple[str, int, int]) -> None:
+        """Adjust children-count and descendant-count of the ancestors of changed notes.
+
+        Each change is a (filename, children_delta, descendant_delta) triple
+        for a note that was added, removed or replaced at filename. The stored
+        counts of its ancestors are adjusted by the deltas, so the cost depends
+        on the depth of the note rather than on the size of its subtree, and
+        each affected index file is saved once.
+        """
+        changed_indexes: Dict[Optional[Path], Dict[str, Dict[str, any]]] = {}
+        for filename, children_delta, descendant_delta in changes:
+            # Walk up from the immediate parent; notes under a folder without
+            # its own note aren't counted by the ancestors above it. Each
+            # ancestor's folder is a prefix of the filename, so it is cut off
+            # the end instead of joining path parts again.
+            folder = filename.rpartition('/')[0]
+            while folder:
+                ancestor = f'{folder}.md'
+                parent_dir = self._get_index_dir(ancestor)
+                index, title = self._find_note(ancestor, parent_dir)
+                if not title:
                     break
 
-            if parent_note_name:
-                # Recalculate actual counts
-                parent_filename = parent_index[parent_note_name]['filename']
-                children_count = self._calculate_children_count(parent_filename)
-                descendant_count = self._calculate_descendant_count(parent_filename)
-
-                # Update counts in index (only if > 0)
+                data = index[title]
+                children_count = data.get('children-count', 0) + children_delta
+                descendant_count = data.get('descendant-count', 0) + descendant_delta
                 if children_count > 0:
-                    parent_index[parent_note_name]['children-count'] = children_count
-                    parent_index[parent_note_name]['descendant-count'] = (
-                        descendant_count
-                    )
+                    data['children-count'] = children_count
+                    data['descendant-count'] = descendant_count
                 else:
-                    # Remove count keys if no children
-                    parent_index[parent_note_name].pop('children-count', None)
-                    parent_index[parent_note_name].pop('descendant-count', None)
+                    data.pop('children-count', None)
+                    data.pop('descendant-count', None)
+                changed_indexes[parent_dir] = index
 
-                # Save updated parent index
-                self._save_index(
-                    parent_index, parent_dir if parent_dir != self.directory else None
-                )
+                # Only the immediate parent gains or loses a child
+                children_delta = 0
+                folder = folder.rpartition('/')[0]
+
+        for parent_dir, index in changed_indexes.items():
+            self._save_index(index, parent_dir)
 
     def _load_index(
         self, subdirectory: Optional[Path] = None
     ) -> Dict[str, Dict[str, any]]:
-        """Load the notes index from JSON file."""
+        """Load the notes index from JSON file.
+
+        Parsed indexes are cached in memory and reused for as long as the index
+        file's modification time and size stay the same, so edits made outside
+        of this process are still picked up.
+        """
         index_path = self._get_index_path(subdirectory)
-        if not index_path.exists():
+        if index_path in self._pending_indexes:
+            return self._pending_indexes[index_path]
+
+        try:
+            stat = os.stat(index_path)
+        except FileNotFoundError:
+            self._index_cache.pop(index_path, None)
+            return {}
+
+        cached = self._index_cache.get(index_path)
+        if cached is not None and cached.stamp == (stat.st_mtime_ns, stat.st_size):
+            self._index_cache.move_to_end(index_path)
+            return cached.index
+
+        try:
+            with open(index_path, 'rb') as f:
+                index = orjson.loads(f.read())
+                stat = os.fstat(f.fileno())
+        except FileNotFoundError:
+            # Removed since the stat
+            self._index_cache.pop(index_path, None)
             return {}
+        for data in index.values():
+            data['tags'] = _intern_tags(data['tags'])
+        self._cache_index(index_path, stat, index)
+        return index
+
+    def _cache_index(
+        self, index_path: str, stat: os.stat_result, index: Dict[str, Dict[str, any]]
+    ) -> None:
+        """Remember a parsed index together with the file stamp it was read from.
 
-        with open(index_path, 'r') as f:
-            return json.load(f)
+        An index modified too recently for its stamp to be trusted isn't kept.
+        """
+        if _is_racy(stat):
+            self._index_cache.pop(index_path, None)
+            return
+        self._index_cache[index_path] = _CachedIndex(
+            (stat.st_mtime_ns, stat.st_size), index
+        )
+        self._index_cache.move_to_end(index_path)
+        if len(self._index_cache) > INDEX_CACHE_SIZE:
+            self._index_cache.popitem(last=False)
+
+    def _find_note(
+        self, filename: str, subdirectory: Optional[Path] = None
+    ) -> tuple[Dict[str, Dict[str, any]], Optional[str]]:
+        """Load an index and look up the title of the note stored as filename.
+
+        The filename -> title lookup is built once per cached index instead of
+        scanning all entries on every call.
+        """
+        index = self._load_index(subdirectory)
+        cached = self._get_cached_index(index, subdirectory)
+        if cached is None:
+            # Index modified inside a batch and not written yet
+            for title, data in index.items():
+                if data['filename'] == filename:
+                    return index, title
+            return index, None
+
+        if cached.by_filename is None:
+            cached.by_filename = {}
+            for title, data in index.items():
+                cached.by_filename.setdefault(data['filename'], title)
+        return index, cached.by_filename.get(filename)
+
+    def _get_cached_index(
+        self, index: Dict[str, Dict[str, any]], subdirectory: Optional[Path] = None
+    ) -> Optional[_CachedIndex]:
+        """Get the cache entry for a just loaded index if it is still current."""
+        cached = self._index_cache.get(self._get_index_path(subdirectory))
+        if cached is not None and cached.index is index:
+            return cached
+        return None
 
     def _save_index(
         self, index: Dict[str, Dict[str, any]], subdirectory: Optional[Path] = None
     ) -> None:
-        """Save the notes index to JSON file with updated counts."""
-        # Update counts for each entry before saving
-        for title, data in index.items():
-            filename = data['filename']
-            children_count = self._calculate_children_count(filename)
-            descendant_count = self._calculate_descendant_count(filename)
-
-            # Only add count keys if there are children
-            if children_count > 0:
-                data['children-count'] = children_count
-                data['descendant-count'] = descendant_count
-            else:
-                # Remove count keys if no children
-                data.pop('children-count', None)
-                data.pop('descendant-count', None)
+        """Save the notes index to JSON file, or keep it in memory inside a batch.
 
+        Counts are not recalculated here: new entries get them from
+        _new_entry and ancestors are kept current by _update_parent_counts.
+        """
         index_path = self._get_index_path(subdirectory)
-        # Ensure the directory exists
-        index_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(index_path, 'w') as f:
-            json.dump(index, f, indent=2)
+        if self._batch_depth:
+            self._pending_indexes[index_path] = index
+            self._index_cache.pop(index_path, None)
+        else:
+            self._write_index(index_path, index)
 
-    def _title_to_filename(self, title: str) -> str:
+    def _write_index(self, index_path: str, index: Dict[str, Dict[str, any]]) -> None:
+        """Write an index file and refresh its cache entry.
+
+        The data goes to a temporary sibling first and is then renamed over
+        the index, so readers never see a partially written file. The
+        temporary name is unique to the process and thread, so servers
+        sharing a notes directory don't rename each other's half-written
+        files, and it is removed again if the write fails.
+        """
+        tmp_path = f'{index_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        # Compact output: the index is only read back by Storage
+        data = orjson.dumps(index)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+        try:
+            fd = os.open(tmp_path, flags, 0o666)
+        except FileNotFoundError:
+            # The directory doesn't exist yet
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            fd = os.open(tmp_path, flags, 0o666)
+        try:
+            try:
+                # A single write unless the kernel accepts only part of the data
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view) :]
+                stat = os.fstat(fd)
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, index_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._cache_index(index_path, stat, index)
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _title_to_filename(title: str) -> str:
         """Convert title to filename, replacing non-alphanumeric chars with underscores."""
-        # Replace all non-alphanumeric characters with underscores
-        filename = re.sub(r'[^a-zA-Z0-9]', '_', title.lower())
-        # Remove consecutive underscores and trailing underscores
-        filename = re.sub(r'_+', '_', filename).strip('_')
+        # Collapse each run of non-alphanumeric characters into one underscore
+        # and drop leading and trailing underscores
+        title = title.lower()
+        if title.isascii():
+            # Byte translation avoids the regex engine for the common case
+            parts = title.encode('ascii').translate(_FILENAME_BYTES).split(b'_')
+            filename = b'_'.join(filter(None, parts)).decode('ascii')
+        else:
+            filename = _NON_ALNUM_RUN.sub('_', title).strip('_')
         return f'{filename}.md'
 
     def _ensure_unique_filename(self, base_filename: str) -> str:
         """Ensure filename is unique by appending numbers if needed."""
-        filename = base_filename
-        counter = 1
-
-        while (self.directory / filename).exists():
-            name_part = base_filename.rsplit('.', 1)[0]
-            filename = f'{name_part}_{counter}.md'
-            counter += 1
-
-        return filename
+        return self._ensure_unique_filename_in_dir(base_filename, self.directory)
 
     def _ensure_unique_filename_in_dir(
         self, base_filename: str, directory: Path
     ) -> str:
         """Ensure filename is unique in a specific directory by appending numbers if needed."""
-        filename = base_filename
-        counter = 1
+        if not os.path.exists(os.path.join(directory, base_filename)):
+            return base_filename
 
-        while (directory / filename).exists():
-            name_part = base_filename.rsplit('.', 1)[0]
-            filename = f'{name_part}_{counter}.md'
+        # On a collision, list the directory once instead of probing each
+        # numbered candidate with its own stat call
+        with os.scandir(directory) as entries:
+            existing = {entry.name for entry in entries}
+
+        name_part = base_filename.rsplit('.', 1)[0]
+        counter = 1
+        filename = f'{name_part}_{counter}.md'
+        while filename in existing:
             counter += 1
+            filename = f'{name_part}_{counter}.md'
 
         return filename
 
@@ -235,9 +561,9 @@ class Storage:
 
         # Determine target directory and full filename
         if parent:
-            # Create subdirectory for parent note
+            # The subdirectory for the parent note is created with the file
+            self._check_relative_path(parent)
             parent_dir = self.directory / parent
-            parent_dir.mkdir(parents=True, exist_ok=True)
 
             # Check for unique filename in the parent directory
             filename = self._ensure_unique_filename_in_dir(base_filename, parent_dir)
@@ -251,47 +577,101 @@ class Storage:
             note_path = self.directory / filename
             target_dir = self.directory
 
-        # Format note content
-        tags_str = ', '.join(tags) if tags else ''
-        note_content = f'# {title}\nTags: {tags_str}\n\n{content}'
-
         # Write note file
-        with open(note_path, 'w') as f:
-            f.write(note_content)
+        self._forget_content(full_filename)
+        with _create_note_file(note_path) as f:
+            _write_note(f, title, tags, content)
 
         # Update index in the appropriate directory
         index = self._load_index(target_dir if parent else None)
-        index[title] = {'filename': full_filename, 'tags': tags}
+        # A note with the same title is replaced in the index
+        replaced = index.get(title)
+        index[title] = self._new_entry(full_filename, _intern_tags(tags))
         self._save_index(index, target_dir if parent else None)
 
         # Update parent counts if this is a child note
         if parent:
-            self._update_parent_counts(full_filename, 1)
+            descendant_delta = _subtree_size(index[title])
+            if replaced is not None:
+                descendant_delta -= _subtree_size(replaced)
+            self._update_parent_counts(
+                (full_filename, 0 if replaced else 1, descendant_delta)
+            )
 
         return note_path
 
     def get_note(self, *, filename: str) -> Optional[str]:
-        """Retrieve a note by filename."""
-        note_path = self.directory / filename
-        if not note_path.exists():
+        """Retrieve a note by filename.
+
+        Recently read notes are served from memory while their modification
+        time and size are unchanged, unless they were modified just before
+        they were read.
+        """
+        note_path = self._note_path(filename)
+        try:
+            stat = os.stat(note_path)
+        except FileNotFoundError:
+            self._forget_content(filename)
             return None
 
-        with open(note_path, 'r') as f:
-            return f.read()
+        cached = self._content_cache.get(filename)
+        if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            self._content_cache.move_to_end(filename)
+            return cached[1]
+
+        try:
+            content, stat = _read_note_file(note_path)
+        except FileNotFoundError:
+            # Deleted since the stat
+            self._forget_content(filename)
+            return None
+        self._remember_content(filename, stat, content)
+        return content
+
+    def _remember_content(
+        self, filename: str, stat: os.stat_result, content: str
+    ) -> None:
+        """Cache note content, evicting least recently used notes over budget.
+
+        Notes modified too recently for their stamp to be trusted aren't kept.
+        """
+        self._forget_content(filename)
+        if stat.st_size > CONTENT_CACHE_BYTES or _is_racy(stat):
+            return
+
+        self._content_cache[filename] = ((stat.st_mtime_ns, stat.st_size), content)
+        self._content_cache_bytes += stat.st_size
+        while self._content_cache_bytes > CONTENT_CACHE_BYTES:
+            _, ((_, size), _) = self._content_cache.popitem(last=False)
+            self._content_cache_bytes -= size
+
+    def _forget_content(self, filename: str) -> None:
+        """Drop cached content of a note that is being changed or removed."""
+        cached = self._content_cache.pop(filename, None)
+        if cached is not None:
+            self._content_cache_bytes -= cached[0][1]
 
     def list_notes(self, parent: Optional[str] = None) -> List[Dict[str, any]]:
-        """List notes in the directory or a specific parent subdirectory."""
+        """List notes in the directory or a specific parent subdirectory.
+
+        The row dicts are cached until the index changes, so callers must not
+        modify them.
+        """
         parent = self._normalize_parent(parent)
 
         if parent:
-            # List notes in specific subdirectory
+            # List notes in specific subdirectory, a missing one has no index
+            self._check_relative_path(parent)
             parent_dir = self.directory / parent
-            if not parent_dir.exists():
-                return []
-            index = self._load_index(parent_dir)
         else:
             # List top-level notes
-            index = self._load_index()
+            parent_dir = None
+        index = self._load_index(parent_dir)
+
+        # Rows are built once per version of the index file
+        cached = self._get_cached_index(index, parent_dir)
+        if cached is not None and cached.listing is not None:
+            return list(cached.listing)
 
         result = []
         for title, data in index.items():
@@ -306,144 +686,136 @@ class Storage:
             if 'descendant-count' in data:
                 note_info['descendant_count'] = data['descendant-count']
             result.append(note_info)
+
+        if cached is not None:
+            cached.listing = result
+            return list(result)
         return result
 
     def delete_note(self, *, filename: str) -> bool:
         """Delete a note by filename."""
-        note_path = self.directory / filename
-        if not note_path.exists():
+        note_path = self._note_path(filename)
+        try:
+            os.unlink(note_path)
+        except FileNotFoundError:
             return False
+        self._forget_content(filename)
 
         # Determine which directory's index to update
-        note_dir = self._get_directory_for_note(filename)
-        target_dir = note_dir if note_dir != self.directory else None
+        target_dir = self._get_index_dir(filename)
 
         # Find title by filename and remove from index
-        index = self._load_index(target_dir)
-        title_to_delete = None
-        for title, data in index.items():
-            if data['filename'] == filename:
-                title_to_delete = title
-                break
-
+        index, title_to_delete = self._find_note(filename, target_dir)
         if title_to_delete:
-            del index[title_to_delete]
+            removed = index.pop(title_to_delete)
             self._save_index(index, target_dir)
 
-        # Delete file
-        note_path.unlink()
-
         # Update parent counts if this was a child note
-        if target_dir and note_dir != self.directory:
-            self._update_parent_counts(filename, -1)
+        if title_to_delete and target_dir:
+            self._update_parent_counts((filename, -1, -_subtree_size(removed)))
 
         # Clean up empty directory if this was the last note in a subdirectory
-        if target_dir and note_dir != self.directory:
-            self._cleanup_empty_directory(note_dir)
+        if target_dir:
+            self._cleanup_empty_directory(target_dir, index)
 
         return True
 
-    def _cleanup_empty_directory(self, directory: Path) -> None:
-        """Remove directory if it only contains an empty index file or is completely empty."""
-        if not directory.exists() or directory == self.directory:
-            return
+    def _cleanup_empty_directory(
+        self, directory: Path, index: Dict[str, Dict[str, any]]
+    ) -> None:
+        """Remove directory if its index, passed by the caller, lists no notes.
 
-        # Check if directory only contains an empty index file
-        index_file = directory / 'notes_index.json'
-        directory_contents = list(directory.iterdir())
+        The directory is left in place if it still holds anything besides the
+        index file.
+        """
+        if directory == self.directory or index:
+            return
 
-        if not directory_contents:
-            # Directory is completely empty
+        index_file = self._get_index_path(directory)
+        self._pending_indexes.pop(index_file, None)
+        self._index_cache.pop(index_file, None)
+        try:
+            os.unlink(index_file)
+        except FileNotFoundError:
+            pass
+        try:
             directory.rmdir()
-        elif len(directory_contents) == 1 and directory_contents[0] == index_file:
-            # Check if index file is empty
-            index = self._load_index(directory)
-            if not index:
-                # Remove empty index file and directory
-                index_file.unlink()
-                directory.rmdir()
+        except OSError:
+            # Other files or folders are left in it
+            pass
 
     def update_note(self, *, filename: str, content: str, tags: List[str]) -> bool:
         """Update an existing note's content and tags by filename."""
-        note_path = self.directory / filename
-        if not note_path.exists():
-            return False
+        note_path = self._note_path(filename)
 
         # Determine which directory's index to update
-        note_dir = self._get_directory_for_note(filename)
-        target_dir = note_dir if note_dir != self.directory else None
+        target_dir = self._get_index_dir(filename)
 
         # Find title by filename
-        index = self._load_index(target_dir)
-        title = None
-        for t, data in index.items():
-            if data['filename'] == filename:
-                title = t
-                break
-
+        index, title = self._find_note(filename, target_dir)
         if not title:
             return False
 
-        # Format updated note content (preserve original title)
-        tags_str = ', '.join(tags) if tags else ''
-        note_content = f'# {title}\nTags: {tags_str}\n\n{content}'
-
-        # Write updated note file
-        with open(note_path, 'w') as f:
-            f.write(note_content)
+        # Nothing to do if the note already has these tags and content
+        tags = _intern_tags(tags)
+        if tags == index[title]['tags']:
+            header = _note_header(title, tags)
+            try:
+                size = os.stat(note_path).st_size
+            except FileNotFoundError:
+                return False
+            # Only a file of the new text's size can hold it, so the current
+            # text is read just for those instead of on every edit
+            if size == len(header.encode()) + len(content.encode()):
+                current = self.get_note(filename=filename)
+                if current == header + content:
+                    return True
+
+        # Write updated note file, preserving the original title; opening with
+        # 'r+' fails if it's gone
+        self._forget_content(filename)
+        try:
+            with open(note_path, 'r+', encoding='utf-8') as f:
+                _write_note(f, title, tags, content)
+                f.truncate()
+        except FileNotFoundError:
+            return False
 
-        # Update index with new tags
-        index[title]['tags'] = tags
-        self._save_index(index, target_dir)
+        # Update index with new tags; content-only edits leave it as is
+        if tags != index[title]['tags']:
+            index[title]['tags'] = tags
+            self._save_index(index, target_dir)
 
         return True
 
     def add_tags(self, *, filename: str, tags_to_add: List[str]) -> bool:
         """Add new tags to an existing note."""
-        note_path = self.directory / filename
-        if not note_path.exists():
-            return False
+        note_path = self._note_path(filename)
 
         # Determine which directory's index to update
-        note_dir = self._get_directory_for_note(filename)
-        target_dir = note_dir if note_dir != self.directory else None
+        target_dir = self._get_index_dir(filename)
 
         # Find title and current tags from index
-        index = self._load_index(target_dir)
-        title = None
-        current_tags = []
-        for t, data in index.items():
-            if data['filename'] == filename:
-                title = t
-                current_tags = data['tags']
-                break
-
+        index, title = self._find_note(filename, target_dir)
         if not title:
             return False
+        current_tags = index[title]['tags']
 
         # Combine existing tags with new tags (using set to avoid duplicates, then sort for consistency)
-        updated_tags = sorted(list(set(current_tags + tags_to_add)))
+        updated_tags = sorted(set(current_tags).union(_intern_tags(tags_to_add)))
+        if updated_tags == current_tags:
+            return True
 
         # Read current note content
-        with open(note_path, 'r') as f:
-            lines = f.readlines()
-
-        # Extract content without title and tags lines
-        content_start = 1
-        if len(lines) > 1 and lines[1].startswith('Tags: '):
-            content_start = 2
-            if len(lines) > 2 and lines[2].strip() == '':
-                content_start = 3
-
-        content = ''.join(lines[content_start:])
-
-        # Format updated note content
-        tags_str = ', '.join(updated_tags) if updated_tags else ''
-        note_content = f'# {title}\nTags: {tags_str}\n\n{content}'
+        try:
+            content = _note_body(_read_note_file(note_path)[0])
+        except FileNotFoundError:
+            return False
 
         # Write updated note file
-        with open(note_path, 'w') as f:
-            f.write(note_content)
+        self._forget_content(filename)
+        with open(note_path, 'w', encoding='utf-8') as f:
+            _write_note(f, title, updated_tags, content)
 
         # Update index with new tags
         index[title]['tags'] = updated_tags
@@ -453,50 +825,33 @@ class Storage:
 
     def remove_tags(self, *, filename: str, tags_to_remove: List[str]) -> bool:
         """Remove specified tags from an existing note."""
-        note_path = self.directory / filename
-        if not note_path.exists():
-            return False
+        note_path = self._note_path(filename)
 
         # Determine which directory's index to update
-        note_dir = self._get_directory_for_note(filename)
-        target_dir = note_dir if note_dir != self.directory else None
+        target_dir = self._get_index_dir(filename)
 
         # Find title and current tags from index
-        index = self._load_index(target_dir)
-        title = None
-        current_tags = []
-        for t, data in index.items():
-            if data['filename'] == filename:
-                title = t
-                current_tags = data['tags']
-                break
-
+        index, title = self._find_note(filename, target_dir)
         if not title:
             return False
+        current_tags = index[title]['tags']
 
         # Remove specified tags
-        updated_tags = [tag for tag in current_tags if tag not in tags_to_remove]
+        to_remove = frozenset(tags_to_remove)
+        updated_tags = [tag for tag in current_tags if tag not in to_remove]
+        if len(updated_tags) == len(current_tags):
+            return True
 
         # Read current note content
-        with open(note_path, 'r') as f:
-            lines = f.readlines()
-
-        # Extract content without title and tags lines
-        content_start = 1
-        if len(lines) > 1 and lines[1].startswith('Tags: '):
-            content_start = 2
-            if len(lines) > 2 and lines[2].strip() == '':
-                content_start = 3
-
-        content = ''.join(lines[content_start:])
-
-        # Format updated note content
-        tags_str = ', '.join(updated_tags) if updated_tags else ''
-        note_content = f'# {title}\nTags: {tags_str}\n\n{content}'
+        try:
+            content = _note_body(_read_note_file(note_path)[0])
+        except FileNotFoundError:
+            return False
 
         # Write updated note file
-        with open(note_path, 'w') as f:
-            f.write(note_content)
+        self._forget_content(filename)
+        with open(note_path, 'w', encoding='utf-8') as f:
+            _write_note(f, title, updated_tags, content)
 
         # Update index with new tags
         index[title]['tags'] = updated_tags
@@ -504,6 +859,7 @@ class Storage:
 
         return True
 
+    @_batched
     def move_note(self, *, filename: str, target_folder: Optional[str] = None) -> str:
         """Move a note to a different folder and update all references.
 
@@ -517,34 +873,67 @@ class Storage:
         Raises:
             ValueError: If source note doesn't exist or target would create duplicate
         """
-        # Check if source note exists
-        source_path = self.directory / filename
-        if not source_path.exists():
-            raise ValueError(f"Source note '{filename}' not found")
+        new_filename = self._relocate_note(filename, target_folder)
+        if new_filename != filename:
+            # Update all references in other notes
+            self._update_note_references({filename: new_filename})
+        return new_filename
+
+    @_batched
+    def move_notes(self, moves: List[tuple[str, Optional[str]]]) -> List[str]:
+        """Move several notes and update references to all of them in one pass.
+
+        If a move fails, the moves before it stay done and references to the
+        notes they moved are still updated before the error is raised.
 
-        # Get source note content and metadata
+        Args:
+            moves: (filename, target_folder) pairs, applied in order
+
+        Returns:
+            The new filename of each moved note
+
+        Raises:
+            ValueError: If a source note doesn't exist or a target is invalid
+        """
+        new_filenames = []
+        replacements = {}
+        try:
+            for filename, target_folder in moves:
+                new_filename = self._relocate_note(filename, target_folder)
+                new_filenames.append(new_filename)
+                if new_filename == filename:
+                    continue
+                # References to earlier names of this note follow it to the new one
+                for old_filename, current in replacements.items():
+                    if current == filename:
+                        replacements[old_filename] = new_filename
+                replacements[filename] = new_filename
+        finally:
+            replacements = {old: new for old, new in replacements.items() if old != new}
+            if replacements:
+                self._update_note_references(replacements)
+        return new_filenames
+
+    def _relocate_note(self, filename: str, target_folder: Optional[str]) -> str:
+        """Move a note file and its index entry, leaving references to it as is."""
+        # Get source note content, which also checks that it exists
+        source_path = self._note_path(filename)
         source_content = self.get_note(filename=filename)
         if source_content is None:
-            raise ValueError(f"Could not read source note '{filename}'")
+            raise ValueError(f"Source note '{filename}' not found")
 
         # Extract title and tags from source note
-        source_dir = self._get_directory_for_note(filename)
-        source_index_dir = source_dir if source_dir != self.directory else None
-        source_index = self._load_index(source_index_dir)
-
-        source_title = None
-        source_tags = []
-        for title, data in source_index.items():
-            if data['filename'] == filename:
-                source_title = title
-                source_tags = data['tags']
-                break
-
+        source_index_dir = self._get_index_dir(filename)
+        source_index, source_title = self._find_note(filename, source_index_dir)
         if not source_title:
             raise ValueError(f"Could not find metadata for note '{filename}'")
+        source_tags = source_index[source_title]['tags']
+        source_size = _subtree_size(source_index[source_title])
 
         # Normalize target folder
         target_folder = self._normalize_parent(target_folder)
+        if target_folder:
+            self._check_relative_path(target_folder)
 
         # Determine new filename
         base_filename = self._title_to_filename(source_title)
@@ -561,7 +950,6 @@ class Storage:
         if target_folder:
             # Moving to subfolder
             target_dir = self.directory / target_folder
-            target_dir.mkdir(parents=True, exist_ok=True)
             new_filename_base = self._ensure_unique_filename_in_dir(
                 base_filename, target_dir
             )
@@ -574,26 +962,24 @@ class Storage:
             new_path = self.directory / new_filename_base
 
         # Extract content without title and tags lines
-        lines = source_content.split('\n')
-        if lines and lines[0].startswith('# '):
-            # Skip title line
-            content_start = 1
-            if len(lines) > 1 and lines[1].startswith('Tags: '):
-                # Skip tags line too
-                content_start = 2
-                if len(lines) > 2 and lines[2] == '':
-                    # Skip empty line after tags
-                    content_start = 3
-            content = '\n'.join(lines[content_start:])
+        if source_content.startswith('# '):
+            content = _note_body(source_content)
         else:
             content = source_content
 
         # Write note to new location
-        tags_str = ', '.join(source_tags) if source_tags else ''
-        new_content = f'# {source_title}\nTags: {tags_str}\n\n{content}'
+        self._forget_content(new_full_filename)
+        with _create_note_file(new_path) as f:
+            _write_note(f, source_title, source_tags, content)
 
-        with open(new_path, 'w') as f:
-            f.write(new_content)
+        # Remove the source first, so that the counts of the new entry and of
+        # the target's ancestors don't include it a second time when the note
+        # moves up into a folder that still contains it
+        del source_index[source_title]
+        self._save_index(source_index, source_index_dir)
+        os.unlink(source_path)
+        self._forget_content(filename)
+        self._update_parent_counts((filename, -1, -source_size))
 
         # Update target directory index
         if target_folder:
@@ -603,66 +989,136 @@ class Storage:
             target_index_dir = None
             target_index = self._load_index()
 
-        target_index[source_title] = {
-            'filename': new_full_filename,
-            'tags': source_tags,
-        }
+        replaced = target_index.get(source_title)
+        target_index[source_title] = self._new_entry(new_full_filename, source_tags)
         self._save_index(target_index, target_index_dir)
-
-        # Remove from source index
-        del source_index[source_title]
-        self._save_index(source_index, source_index_dir)
-
-        # Delete original file
-        source_path.unlink()
-
-        # Update parent counts
-        if source_dir != self.directory:
-            self._update_parent_counts(filename, -1)
-        if target_folder:
-            self._update_parent_counts(new_full_filename, 1)
+        target_delta = _subtree_size(target_index[source_title])
+        if replaced is not None:
+            target_delta -= _subtree_size(replaced)
+        self._update_parent_counts(
+            (new_full_filename, 0 if replaced else 1, target_delta)
+        )
 
         # Clean up empty source directory
-        if source_dir != self.directory:
-            self._cleanup_empty_directory(source_dir)
-
-        # Update all references in other notes
-        self._update_note_references(filename, new_full_filename)
+        if source_index_dir:
+            self._cleanup_empty_directory(source_index_dir, source_index)
 
         return new_full_filename
 
-    def _update_note_references(self, old_filename: str, new_filename: str) -> None:
-        """Update all references to a moved note in other notes."""
-        # Get all note files recursively
+    def _list_all_notes(self) -> List[str]:
+        """List all note files recursively, relative to the base directory."""
+        # DirEntry type checks use the information returned with the listing
+        # instead of a stat call per entry.
         all_notes = []
+        pending_dirs = ['']
+        while pending_dirs:
+            rel_dir = pending_dirs.pop()
+            with os.scandir(os.path.join(self.directory, rel_dir)) as entries:
+                for entry in entries:
+                    rel_path = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+                    if entry.is_file(follow_symlinks=False):
+                        if entry.name.endswith('.md'):
+                            all_notes.append(rel_path)
+                    elif (
+                        entry.is_dir(follow_symlinks=False)
+                        and entry.name != '__pycache__'
+                    ):
+                        pending_dirs.append(rel_path)
+        return all_notes
+
+    def _find_notes_containing(self, *texts: str) -> Optional[List[str]]:
+        """List notes that contain any of texts using rg or grep.
+
+        Returns None if neither tool is available or the search fails, in which
+        case callers have to check every note themselves.
+        """
+        command = _search_command()
+        if command is None:
+            return None
+        try:
+            result = subprocess.run(
+                [
+                    *command,
+                    *(arg for text in texts for arg in ('-e', text)),
+                    self._directory_str,
+                ],
+                capture_output=True,
+            )
+        except OSError:
+            return None
+        # Exit status 1 means no matches, anything above it is an error
+        if result.returncode > 1:
+            return None
 
-        def collect_notes(directory: Path):
-            for item in directory.iterdir():
-                if item.is_file() and item.name.endswith('.md'):
-                    # Get relative path from base directory
-                    rel_path = item.relative_to(self.directory)
-                    all_notes.append(str(rel_path))
-                elif item.is_dir() and item.name != '__pycache__':
-                    collect_notes(item)
-
-        collect_notes(self.directory)
-
-        # Update references in each note
-        for note_filename in all_notes:
-            if note_filename == new_filename:
-                # Skip the moved note itself
-                continue
+        prefix_len = len(self._directory_str) + 1
+        return [
+            os.fsdecode(path)[prefix_len:]
+            for path in result.stdout.split(b'\0')
+            if path
+        ]
 
-            note_path = self.directory / note_filename
-            try:
-                with open(note_path, 'r') as f:
-                    content = f.read()
-
-                # Simple text replacement as specified in TODO
-                if old_filename in content:
-                    updated_content = content.replace(old_filename, new_filename)
-                    with open(note_path, 'w') as f:
-                        f.write(updated_content)
-            except (IOError, OSError):
-                # Skip files that can't be read/written
+    def _update_note_references(self, replacements: Dict[str, str]) -> None:
+        """Update all references to moved notes in other notes.
+
+        A moved note keeps mentions of its own earlier filenames and only gets
+        references to the other moved notes updated.
+
+        Args:
+            replacements: Maps old filenames of moved notes to their new ones
+        """
+        # Only notes that mention an old filename need to be read, so let an
+        # external search tool find them if there is one
+        all_notes = self._find_notes_containing(*replacements)
+        if all_notes is None:
+            all_notes = self._list_all_notes()
+
+        replace = _reference_replacer(replacements)
+        moved = set(replacements.values())
+        notes = []
+        replacers = []
+        for name in all_notes:
+            if name not in moved:
+                notes.append(name)
+                replacers.append(replace)
                 continue
+            others = {old: new for old, new in replacements.items() if new != name}
+            if others:
+                notes.append(name)
+                replacers.append(_reference_replacer(others))
+
+        if len(notes) > 1:
+            # The rewrites are independent and spend their time in file I/O,
+            # so run them in threads
+            with ThreadPoolExecutor(max_workers=min(32, len(notes))) as executor:
+                rewritten = list(
+                    executor.map(self._rewrite_references_in, notes, replacers)
+                )
+        else:
+            rewritten = list(map(self._rewrite_references_in, notes, replacers))
+
+        # The content cache isn't thread safe, so drop stale entries here
+        for note_filename, changed in zip(notes, rewritten):
+            if changed:
+                self._forget_content(note_filename)
+
+    def _rewrite_references_in(
+        self, note_filename: str, replace: Callable[[str], str]
+    ) -> bool:
+        """Rewrite references to moved notes in one note.
+
+        Returns whether the note was changed.
+        """
+        note_path = self._note_path(note_filename)
+        try:
+            content, _ = _read_note_file(note_path)
+
+            # Simple text replacement as specified in TODO
+            updated_content = replace(content)
+            if updated_content == content:
+                return False
+            with open(note_path, 'w', encoding='utf-8') as f:
+                f.write(updated_content)
+        except (IOError, OSError):
+            # Skip files that can't be read/written
+            return False
+        return True
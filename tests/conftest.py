@@ -0,0 +1,13 @@
+import asyncio
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+
+def pytest_asyncio_loop_factories(config, item):
+    """Run async tests on uvloop where it is installed."""
+    if uvloop is None:
+        return {'asyncio': asyncio.new_event_loop}
+    return {'uvloop': uvloop.new_event_loop}
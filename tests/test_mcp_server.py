@@ -1,949 +1,655 @@
-import tempfile
-from pathlib import Path
+import asyncio
 
 import pytest
+import pytest_asyncio
 from fastmcp import Client
+from fastmcp.exceptions import ToolError
 
-from mcp_notes.mcp_server import app
+from mcp_notes.mcp_server import NoteNotFoundError, make_app, raise_if_missing
 from mcp_notes.storage import Storage
 
 
-@pytest.fixture
-def temp_dir():
-    with tempfile.TemporaryDirectory() as td:
-        yield Path(td)
+def by_title(notes):
+    """Index list_notes results by note title."""
+    return {note['title']: note for note in notes}
+
+
+@pytest.fixture(scope='session')
+def mcp_server():
+    """Create a notes server for the test session."""
+    return make_app()
+
+
+@pytest.fixture(autouse=True)
+def storage(mcp_server, tmp_path):
+    """Give each test fresh temporary storage behind the shared server."""
+    mcp_server.storage = Storage(tmp_path)
+    return mcp_server.storage
 
 
 @pytest.fixture
-def mcp_server(temp_dir):
-    """Create FastMCP server with temporary storage for testing."""
-    app.storage = Storage(temp_dir)
-    return app
+def parent_with_child(storage):
+    """Add 'Parent Note' with one child, 'Child Note', directly to storage."""
+    storage.add_note('Parent Note', 'Parent content', ['parent'])
+    storage.add_note('Child Note', 'Child content', ['child'], parent='parent_note')
 
 
-@pytest.mark.asyncio
-async def test_add_note_success(mcp_server):
-    """Test adding a note successfully."""
+@pytest_asyncio.fixture(scope='session')
+async def client(mcp_server):
+    """Connect one client to the server for the whole test session."""
     async with Client(mcp_server) as client:
-        result = await client.call_tool(
-            'add_note',
+        yield client
+
+
+@pytest.mark.parametrize(
+    'payload,expected_file',
+    [
+        (
             {
                 'title': 'Test Note',
                 'content': 'This is test content',
                 'tags': ['test', 'example'],
             },
-        )
-
-        assert 'Test Note' in result.data
-        assert 'test_note.md' in result.data
-
-
-@pytest.mark.asyncio
-async def test_add_note_without_tags(mcp_server):
-    """Test adding a note without tags."""
-    async with Client(mcp_server) as client:
-        result = await client.call_tool(
-            'add_note', {'title': 'No Tags Note', 'content': 'Content without tags'}
-        )
-
-        assert 'No Tags Note' in result.data
-
-
-@pytest.mark.asyncio
-async def test_get_note_by_filename_success(mcp_server):
-    """Test retrieving a note by filename."""
-    # First add a note
-    async with Client(mcp_server) as client:
-        await client.call_tool(
-            'add_note',
+            'test_note.md',
+        ),
+        (
+            {'title': 'No Tags Note', 'content': 'Content without tags'},
+            'no_tags_note.md',
+        ),
+        (
             {
-                'title': 'Retrievable Note',
-                'content': 'Content to retrieve',
-                'tags': ['retrieve'],
+                'title': 'Child Note',
+                'content': 'Child content',
+                'tags': ['child'],
+                'parent': 'parent_note',
             },
-        )
-
-        # Now get it by filename
-        result = await client.call_tool('get_note', {'filename': 'retrievable_note.md'})
-
-        assert '# Retrievable Note' in result.data
-        assert 'Content to retrieve' in result.data
-
-
-@pytest.mark.asyncio
-async def test_get_note_not_found(mcp_server):
+            'child_note.md',
+        ),
+    ],
+    ids=['with_tags', 'without_tags', 'with_parent'],
+)
+async def test_add_note(client, storage, payload, expected_file):
+    """Test adding a note via MCP server."""
+    if 'parent' in payload:
+        storage.add_note('Parent Note', 'Parent content', ['parent'])
+
+    result = await client.call_tool('add_note', payload)
+
+    assert payload['title'] in result.data
+    assert expected_file in result.data
+
+
+async def test_crud_happy_path(client, storage):
+    """Test getting, updating and deleting a note by filename."""
+    storage.add_note('Test Note', 'Original content', ['original'])
+
+    # Get it by filename
+    result = await client.call_tool('get_note', {'filename': 'test_note.md'})
+    assert '# Test Note' in result.data
+    assert 'Original content' in result.data
+
+    # Update it
+    result = await client.call_tool(
+        'update_note',
+        {
+            'filename': 'test_note.md',
+            'content': 'Updated content',
+            'tags': ['updated', 'test'],
+        },
+    )
+    assert 'updated' in result.data
+    assert 'test_note.md' in result.data
+
+    # Verify the update
+    result = await client.call_tool('get_note', {'filename': 'test_note.md'})
+    assert 'Updated content' in result.data
+    assert 'updated, test' in result.data
+
+    # Delete it
+    result = await client.call_tool('delete_note', {'filename': 'test_note.md'})
+    assert 'deleted' in result.data
+
+    # Verify it's gone
+    with pytest.raises(ToolError, match='not found'):
+        await client.call_tool('get_note', {'filename': 'test_note.md'})
+
+
+def test_raise_if_missing():
+    """Test that a missing note raises the typed not-found tool error."""
+    raise_if_missing(True, 'present.md')
+    with pytest.raises(NoteNotFoundError, match="'absent.md' not found"):
+        raise_if_missing(False, 'absent.md')
+
+
+async def test_get_note_not_found(client):
     """Test getting a non-existent note."""
-    async with Client(mcp_server) as client:
-        with pytest.raises(Exception) as exc_info:
-            await client.call_tool('get_note', {'filename': 'non_existent.md'})
-        assert 'not found' in str(exc_info.value)
+    with pytest.raises(ToolError, match='not found'):
+        await client.call_tool('get_note', {'filename': 'non_existent.md'})
 
 
-@pytest.mark.asyncio
-async def test_list_notes_empty(mcp_server):
-    """Test listing notes when no notes exist."""
-    async with Client(mcp_server) as client:
-        result = await client.call_tool('list_notes', {})
+async def test_tools_use_storage_overrides(client, mcp_server, tmp_path):
+    """Test that tools call methods overridden in a Storage subclass."""
 
-        assert result.data == []
+    class UppercaseStorage(Storage):
+        def get_note(self, *, filename):
+            content = super().get_note(filename=filename)
+            return content and content.upper()
 
+    mcp_server.storage = UppercaseStorage(tmp_path)
+    mcp_server.storage.add_note('Test Note', 'Test content', [])
 
-@pytest.mark.asyncio
-async def test_list_notes_with_content(mcp_server):
-    """Test listing notes when notes exist."""
-    async with Client(mcp_server) as client:
-        # Add a couple of notes
-        await client.call_tool(
-            'add_note',
-            {'title': 'First Note', 'content': 'First content', 'tags': ['first']},
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Second Note',
-                'content': 'Second content',
-                'tags': ['second', 'test'],
-            },
-        )
+    result = await client.call_tool('get_note', {'filename': 'test_note.md'})
+    assert 'TEST CONTENT' in result.data
 
-        # List them
-        result = await client.call_tool('list_notes', {})
 
-        assert len(result.data) == 2
-        titles = [note['title'] for note in result.data]
-        assert 'First Note' in titles
-        assert 'Second Note' in titles
+async def test_list_notes_empty(client):
+    """Test listing notes when no notes exist."""
+    result = await client.call_tool('list_notes', {})
 
+    assert result.data == []
 
-@pytest.mark.asyncio
-async def test_delete_note_by_filename_success(mcp_server):
-    """Test deleting a note by filename."""
-    async with Client(mcp_server) as client:
-        # Add a note
-        await client.call_tool(
-            'add_note',
-            {'title': 'Delete Me', 'content': 'Content to delete', 'tags': ['delete']},
-        )
 
-        # Delete it
-        result = await client.call_tool('delete_note', {'filename': 'delete_me.md'})
+async def test_list_notes_with_content(client, storage):
+    """Test listing notes when notes exist."""
+    # Add a couple of notes
+    storage.add_note('First Note', 'First content', ['first'])
+    storage.add_note('Second Note', 'Second content', ['second', 'test'])
 
-        assert 'deleted' in result.data
+    # List them
+    result = await client.call_tool('list_notes', {})
 
-        # Verify it's gone
-        with pytest.raises(Exception) as exc_info:
-            await client.call_tool('get_note', {'filename': 'delete_me.md'})
-        assert 'not found' in str(exc_info.value)
+    assert len(result.data) == 2
+    titles = [note['title'] for note in result.data]
+    assert 'First Note' in titles
+    assert 'Second Note' in titles
 
 
-@pytest.mark.asyncio
-async def test_delete_note_not_found(mcp_server):
+async def test_delete_note_not_found(client):
     """Test deleting a non-existent note."""
-    async with Client(mcp_server) as client:
-        with pytest.raises(Exception) as exc_info:
-            await client.call_tool('delete_note', {'filename': 'non_existent.md'})
-        assert 'not found' in str(exc_info.value)
+    with pytest.raises(ToolError, match='not found'):
+        await client.call_tool('delete_note', {'filename': 'non_existent.md'})
 
 
-@pytest.mark.asyncio
-async def test_update_note_by_filename_success(mcp_server):
-    """Test updating a note by filename."""
-    async with Client(mcp_server) as client:
-        # Add a note
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Update Test',
-                'content': 'Original content',
-                'tags': ['original'],
-            },
-        )
-
-        # Update it
-        result = await client.call_tool(
-            'update_note',
-            {
-                'filename': 'update_test.md',
-                'content': 'Updated content',
-                'tags': ['updated', 'test'],
-            },
-        )
-
-        assert 'updated' in result.data
-        assert 'update_test.md' in result.data
-
-        # Verify the update
-        get_result = await client.call_tool('get_note', {'filename': 'update_test.md'})
-        assert 'Updated content' in get_result.data
-        assert 'updated, test' in get_result.data
-
-
-@pytest.mark.asyncio
-async def test_update_note_without_tags(mcp_server):
+async def test_update_note_without_tags(client, storage):
     """Test updating a note without providing tags."""
-    async with Client(mcp_server) as client:
-        # Add a note
-        await client.call_tool(
-            'add_note',
-            {'title': 'No Tags Update', 'content': 'Original', 'tags': ['original']},
-        )
+    # Add a note
+    storage.add_note('No Tags Update', 'Original', ['original'])
 
-        # Update without tags parameter
-        result = await client.call_tool(
-            'update_note',
-            {'filename': 'no_tags_update.md', 'content': 'Updated without tags'},
-        )
+    # Update without tags parameter
+    result = await client.call_tool(
+        'update_note',
+        {'filename': 'no_tags_update.md', 'content': 'Updated without tags'},
+    )
 
-        assert 'updated' in result.data
+    assert 'updated' in result.data
 
-        # Verify the update (should have empty tags)
-        get_result = await client.call_tool(
-            'get_note', {'filename': 'no_tags_update.md'}
-        )
-        assert 'Updated without tags' in get_result.data
-        assert 'Tags: \n\n' in get_result.data
+    # Verify the update (should have empty tags)
+    get_result = storage.get_note(filename='no_tags_update.md')
+    assert 'Updated without tags' in get_result
+    assert 'Tags: \n\n' in get_result
 
 
-@pytest.mark.asyncio
-async def test_update_note_not_found(mcp_server):
+async def test_update_note_not_found(client):
     """Test updating a non-existent note."""
-    async with Client(mcp_server) as client:
-        with pytest.raises(Exception) as exc_info:
-            await client.call_tool(
-                'update_note',
-                {'filename': 'non_existent.md', 'content': 'Content', 'tags': []},
-            )
-        assert 'not found' in str(exc_info.value)
-
-
-# Tests for hierarchical notes via MCP server
-@pytest.mark.asyncio
-async def test_add_note_with_parent(mcp_server):
-    """Test adding a note with a parent via MCP server."""
-    async with Client(mcp_server) as client:
-        # Add parent note
-        await client.call_tool(
-            'add_note',
-            {'title': 'Parent Note', 'content': 'Parent content', 'tags': ['parent']},
-        )
-
-        # Add child note
-        result = await client.call_tool(
-            'add_note',
-            {
-                'title': 'Child Note',
-                'content': 'Child content',
-                'tags': ['child'],
-                'parent': 'parent_note',
-            },
-        )
-
-        assert 'Child Note' in result.data
-        assert 'child_note.md' in result.data
-
-
-@pytest.mark.asyncio
-async def test_hierarchical_get_note(mcp_server):
-    """Test getting hierarchical notes via MCP server."""
-    async with Client(mcp_server) as client:
-        # Add parent and child notes
-        await client.call_tool(
-            'add_note',
-            {'title': 'Parent Note', 'content': 'Parent content', 'tags': ['parent']},
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Child Note',
-                'content': 'Child content',
-                'tags': ['child'],
-                'parent': 'parent_note',
-            },
-        )
-
-        # Get child note using full path
-        result = await client.call_tool(
-            'get_note', {'filename': 'parent_note/child_note.md'}
-        )
-
-        assert '# Child Note' in result.data
-        assert 'Child content' in result.data
-
-
-@pytest.mark.asyncio
-async def test_list_notes_hierarchical(mcp_server):
-    """Test listing notes with hierarchy via MCP server."""
-    async with Client(mcp_server) as client:
-        # Add parent and child notes
-        await client.call_tool(
-            'add_note',
-            {'title': 'Parent Note', 'content': 'Parent content', 'tags': ['parent']},
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Child Note 1',
-                'content': 'Child content 1',
-                'tags': ['child1'],
-                'parent': 'parent_note',
-            },
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Child Note 2',
-                'content': 'Child content 2',
-                'tags': ['child2'],
-                'parent': 'parent_note',
-            },
-        )
-
-        # List top-level notes (should only show parent)
-        top_result = await client.call_tool('list_notes', {})
-        assert len(top_result.data) == 1
-        assert top_result.data[0]['title'] == 'Parent Note'
-
-        # List notes in parent directory (should show children)
-        child_result = await client.call_tool('list_notes', {'parent': 'parent_note'})
-        assert len(child_result.data) == 2
-        child_titles = {note['title'] for note in child_result.data}
-        assert child_titles == {'Child Note 1', 'Child Note 2'}
-
-
-@pytest.mark.asyncio
-async def test_hierarchical_delete_note(mcp_server):
-    """Test deleting hierarchical notes via MCP server."""
-    async with Client(mcp_server) as client:
-        # Add parent and child notes
-        await client.call_tool(
-            'add_note',
-            {'title': 'Parent Note', 'content': 'Parent content', 'tags': ['parent']},
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Child Note',
-                'content': 'Child content',
-                'tags': ['child'],
-                'parent': 'parent_note',
-            },
-        )
-
-        # Delete child note
-        result = await client.call_tool(
-            'delete_note', {'filename': 'parent_note/child_note.md'}
-        )
-        assert 'deleted' in result.data
-
-        # Verify child note is gone
-        with pytest.raises(Exception) as exc_info:
-            await client.call_tool(
-                'get_note', {'filename': 'parent_note/child_note.md'}
-            )
-        assert 'not found' in str(exc_info.value)
-
-
-@pytest.mark.asyncio
-async def test_hierarchical_update_note(mcp_server):
-    """Test updating hierarchical notes via MCP server."""
-    async with Client(mcp_server) as client:
-        # Add parent and child notes
-        await client.call_tool(
-            'add_note',
-            {'title': 'Parent Note', 'content': 'Parent content', 'tags': ['parent']},
-        )
+    with pytest.raises(ToolError, match='not found'):
         await client.call_tool(
-            'add_note',
-            {
-                'title': 'Child Note',
-                'content': 'Original child content',
-                'tags': ['child'],
-                'parent': 'parent_note',
-            },
-        )
-
-        # Update child note
-        result = await client.call_tool(
             'update_note',
-            {
-                'filename': 'parent_note/child_note.md',
-                'content': 'Updated child content',
-                'tags': ['updated', 'child'],
-            },
+            {'filename': 'non_existent.md', 'content': 'Content', 'tags': []},
         )
-        assert 'updated' in result.data
 
-        # Verify the update
-        get_result = await client.call_tool(
-            'get_note', {'filename': 'parent_note/child_note.md'}
-        )
-        assert 'Updated child content' in get_result.data
-        assert 'updated, child' in get_result.data
 
-
-@pytest.mark.asyncio
-async def test_count_information_via_mcp(mcp_server):
+# Tests for hierarchical notes via MCP server
+async def test_hierarchical_crud_happy_path(client, parent_with_child):
+    """Test getting, updating and deleting a child note via MCP server."""
+    # Get child note using full path
+    result = await client.call_tool(
+        'get_note', {'filename': 'parent_note/child_note.md'}
+    )
+    assert '# Child Note' in result.data
+    assert 'Child content' in result.data
+
+    # Update child note
+    result = await client.call_tool(
+        'update_note',
+        {
+            'filename': 'parent_note/child_note.md',
+            'content': 'Updated child content',
+            'tags': ['updated', 'child'],
+        },
+    )
+    assert 'updated' in result.data
+
+    # Verify the update
+    result = await client.call_tool(
+        'get_note', {'filename': 'parent_note/child_note.md'}
+    )
+    assert 'Updated child content' in result.data
+    assert 'updated, child' in result.data
+
+    # Delete child note
+    result = await client.call_tool(
+        'delete_note', {'filename': 'parent_note/child_note.md'}
+    )
+    assert 'deleted' in result.data
+
+    # Verify child note is gone
+    with pytest.raises(ToolError, match='not found'):
+        await client.call_tool('get_note', {'filename': 'parent_note/child_note.md'})
+
+
+async def test_list_notes_hierarchical(client, storage):
+    """Test listing notes with hierarchy via MCP server."""
+    # Add parent and child notes
+    storage.add_note('Parent Note', 'Parent content', ['parent'])
+    storage.add_note(
+        'Child Note 1', 'Child content 1', ['child1'], parent='parent_note'
+    )
+    storage.add_note(
+        'Child Note 2', 'Child content 2', ['child2'], parent='parent_note'
+    )
+
+    # List top-level notes and notes in parent directory
+    top_result, child_result = await asyncio.gather(
+        client.call_tool('list_notes', {}),
+        client.call_tool('list_notes', {'parent': 'parent_note'}),
+    )
+
+    # Top level should only show parent
+    assert len(top_result.data) == 1
+    assert top_result.data[0]['title'] == 'Parent Note'
+
+    # Parent directory should show children
+    assert len(child_result.data) == 2
+    child_titles = {note['title'] for note in child_result.data}
+    assert child_titles == {'Child Note 1', 'Child Note 2'}
+
+
+async def test_count_information_via_mcp(client, storage):
     """Test that count information is exposed through MCP server."""
-    async with Client(mcp_server) as client:
-        # Add parent note
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Parent Project',
-                'content': 'Parent content',
-                'tags': ['project'],
-            },
-        )
+    # Add parent note
+    storage.add_note('Parent Project', 'Parent content', ['project'])
 
-        # Initially no count information (no children)
-        result = await client.call_tool('list_notes', {})
-        parent_note = next(
-            note for note in result.data if note['title'] == 'Parent Project'
-        )
-        assert parent_note['children_count'] is None
-        assert parent_note['descendant_count'] is None
+    # Initially no count information (no children)
+    result = await client.call_tool('list_notes', {})
+    parent_note = by_title(result.data)['Parent Project']
+    assert parent_note['children_count'] is None
+    assert parent_note['descendant_count'] is None
 
-        # Add child notes
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Task 1',
-                'content': 'First task',
-                'tags': ['task'],
-                'parent': 'parent_project',
-            },
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Task 2',
-                'content': 'Second task',
-                'tags': ['task'],
-                'parent': 'parent_project',
-            },
-        )
+    # Add child notes
+    storage.add_note('Task 1', 'First task', ['task'], parent='parent_project')
+    storage.add_note('Task 2', 'Second task', ['task'], parent='parent_project')
 
-        # Now should have count information
-        result = await client.call_tool('list_notes', {})
-        parent_note = next(
-            note for note in result.data if note['title'] == 'Parent Project'
-        )
-        assert parent_note['children_count'] == 2
-        assert parent_note['descendant_count'] == 2
+    # Now should have count information
+    result = await client.call_tool('list_notes', {})
+    parent_note = by_title(result.data)['Parent Project']
+    assert parent_note['children_count'] == 2
+    assert parent_note['descendant_count'] == 2
 
-        # Child notes should not have count information
-        child_result = await client.call_tool(
-            'list_notes', {'parent': 'parent_project'}
-        )
-        for child_note in child_result.data:
-            assert child_note['children_count'] is None
-            assert child_note['descendant_count'] is None
+    # Child notes should not have count information
+    child_result = await client.call_tool('list_notes', {'parent': 'parent_project'})
+    for child_note in child_result.data:
+        assert child_note['children_count'] is None
+        assert child_note['descendant_count'] is None
 
 
 # Tests for move_note functionality via MCP server
-@pytest.mark.asyncio
-async def test_move_note_to_root_via_mcp(mcp_server):
+async def test_move_note_to_root_via_mcp(client, storage, parent_with_child):
     """Test moving a note to root directory via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create parent and child notes
-        await client.call_tool(
-            'add_note',
-            {'title': 'Parent Note', 'content': 'Parent content', 'tags': ['parent']},
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Child Note',
-                'content': 'Child content',
-                'tags': ['child'],
-                'parent': 'parent_note',
-            },
-        )
-
-        # Move child to root
-        result = await client.call_tool(
-            'move_note',
-            {'filename': 'parent_note/child_note.md', 'target_folder': None},
-        )
+    # Move child to root
+    result = await client.call_tool(
+        'move_note',
+        {'filename': 'parent_note/child_note.md', 'target_folder': None},
+    )
 
-        assert 'moved to root directory' in result.data
-        assert 'child_note.md' in result.data
+    assert 'moved to root directory' in result.data
+    assert 'child_note.md' in result.data
 
-        # Verify note exists in new location
-        get_result = await client.call_tool('get_note', {'filename': 'child_note.md'})
-        assert '# Child Note' in get_result.data
-        assert 'Child content' in get_result.data
+    # Verify note exists in new location
+    get_result = storage.get_note(filename='child_note.md')
+    assert '# Child Note' in get_result
+    assert 'Child content' in get_result
 
-        # Verify note no longer exists in old location
-        with pytest.raises(Exception):
-            await client.call_tool(
-                'get_note', {'filename': 'parent_note/child_note.md'}
-            )
+    # Verify note no longer exists in old location
+    with pytest.raises(ToolError):
+        await client.call_tool('get_note', {'filename': 'parent_note/child_note.md'})
 
 
-@pytest.mark.asyncio
-async def test_move_note_to_subfolder_via_mcp(mcp_server):
+async def test_move_note_to_subfolder_via_mcp(client, storage):
     """Test moving a note to subfolder via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create notes
-        await client.call_tool(
-            'add_note',
-            {'title': 'Root Note', 'content': 'Root content', 'tags': ['root']},
-        )
-        await client.call_tool(
-            'add_note',
-            {'title': 'Archive', 'content': 'Archive content', 'tags': ['archive']},
-        )
+    # Create notes
+    storage.add_note('Root Note', 'Root content', ['root'])
+    storage.add_note('Archive', 'Archive content', ['archive'])
 
-        # Move root note to archive folder
-        result = await client.call_tool(
-            'move_note', {'filename': 'root_note.md', 'target_folder': 'archive'}
-        )
+    # Move root note to archive folder
+    result = await client.call_tool(
+        'move_note', {'filename': 'root_note.md', 'target_folder': 'archive'}
+    )
 
-        assert 'moved to' in result.data
-        assert 'archive/' in result.data
-        assert 'archive/root_note.md' in result.data
+    assert 'moved to' in result.data
+    assert 'archive/' in result.data
+    assert 'archive/root_note.md' in result.data
 
-        # Verify note exists in new location
-        get_result = await client.call_tool(
-            'get_note', {'filename': 'archive/root_note.md'}
-        )
-        assert '# Root Note' in get_result.data
-        assert 'Root content' in get_result.data
+    # Verify note exists in new location
+    get_result = storage.get_note(filename='archive/root_note.md')
+    assert '# Root Note' in get_result
+    assert 'Root content' in get_result
 
 
-@pytest.mark.asyncio
-async def test_move_note_updates_references_via_mcp(mcp_server):
+async def test_move_note_updates_references_via_mcp(client, storage):
     """Test that move_note updates references in other notes via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create notes with references
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Main Note',
-                'content': 'See task.md for details',
-                'tags': ['main'],
-            },
-        )
-        await client.call_tool(
-            'add_note',
-            {'title': 'Task', 'content': 'Task content', 'tags': ['task']},
-        )
-        await client.call_tool(
-            'add_note',
-            {'title': 'Archive', 'content': 'Archive content', 'tags': ['archive']},
-        )
-
-        # Move task to archive
-        await client.call_tool(
-            'move_note', {'filename': 'task.md', 'target_folder': 'archive'}
-        )
-
-        # Check that reference was updated
-        main_result = await client.call_tool('get_note', {'filename': 'main_note.md'})
-        assert 'archive/task.md' in main_result.data
-        # Ensure old reference is gone (not just appended)
-        content_without_new_ref = main_result.data.replace('archive/task.md', '')
-        assert 'task.md' not in content_without_new_ref
-
-
-@pytest.mark.asyncio
-async def test_move_note_empty_string_target_via_mcp(mcp_server):
+    # Create notes with references
+    storage.add_note('Main Note', 'See task.md for details', ['main'])
+    storage.add_note('Task', 'Task content', ['task'])
+    storage.add_note('Archive', 'Archive content', ['archive'])
+
+    # Move task to archive
+    await client.call_tool(
+        'move_note', {'filename': 'task.md', 'target_folder': 'archive'}
+    )
+
+    # Check that reference was updated
+    main_result = storage.get_note(filename='main_note.md')
+    assert 'archive/task.md' in main_result
+    # Ensure old reference is gone (not just appended)
+    content_without_new_ref = main_result.replace('archive/task.md', '')
+    assert 'task.md' not in content_without_new_ref
+
+
+async def test_move_notes_via_mcp(client, storage):
+    """Test moving several notes in one call via MCP server."""
+    storage.add_note('Main Note', 'See task.md and plan.md', [])
+    storage.add_note('Archive', 'Archive content', [])
+    storage.add_note('Task', 'Task content', [], parent='archive')
+    storage.add_note('Plan', 'Plan content', [])
+
+    result = await client.call_tool(
+        'move_notes',
+        {
+            'moves': [
+                {'filename': 'archive/task.md', 'target_folder': ''},
+                {'filename': 'plan.md', 'target_folder': 'archive'},
+            ]
+        },
+    )
+
+    assert "'archive/task.md' as 'task.md'" in result.data
+    assert "'plan.md' as 'archive/plan.md'" in result.data
+    main_result = storage.get_note(filename='main_note.md')
+    assert 'See task.md and archive/plan.md' in main_result
+
+
+async def test_move_note_empty_string_target_via_mcp(client, storage):
     """Test that empty string target_folder is treated as None via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create parent and child
-        await client.call_tool(
-            'add_note',
-            {'title': 'Parent', 'content': 'Parent content', 'tags': ['parent']},
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Child',
-                'content': 'Child content',
-                'tags': ['child'],
-                'parent': 'parent',
-            },
-        )
+    # Create parent and child
+    storage.add_note('Parent', 'Parent content', ['parent'])
+    storage.add_note('Child', 'Child content', ['child'], parent='parent')
 
-        # Move child to root using empty string
-        result = await client.call_tool(
-            'move_note', {'filename': 'parent/child.md', 'target_folder': ''}
-        )
+    # Move child to root using empty string
+    result = await client.call_tool(
+        'move_note', {'filename': 'parent/child.md', 'target_folder': ''}
+    )
 
-        assert 'moved to root directory' in result.data
+    assert 'moved to root directory' in result.data
 
-        # Verify it's in root
-        get_result = await client.call_tool('get_note', {'filename': 'child.md'})
-        assert '# Child' in get_result.data
+    # Verify it's in root
+    get_result = storage.get_note(filename='child.md')
+    assert '# Child' in get_result
 
 
-@pytest.mark.asyncio
-async def test_move_note_nonexistent_via_mcp(mcp_server):
+async def test_move_note_nonexistent_via_mcp(client):
     """Test moving a nonexistent note via MCP server."""
-    async with Client(mcp_server) as client:
-        with pytest.raises(Exception) as exc_info:
-            await client.call_tool(
-                'move_note',
-                {'filename': 'nonexistent.md', 'target_folder': 'archive'},
-            )
-        assert 'not found' in str(exc_info.value)
-
-
-@pytest.mark.asyncio
-async def test_move_note_updates_counts_via_mcp(mcp_server):
-    """Test that moving notes updates parent counts via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create projects with tasks
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Project A',
-                'content': 'Project A content',
-                'tags': ['projectA'],
-            },
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Project B',
-                'content': 'Project B content',
-                'tags': ['projectB'],
-            },
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Task',
-                'content': 'Task content',
-                'tags': ['task'],
-                'parent': 'project_a',
-            },
-        )
-
-        # Check initial counts
-        initial_result = await client.call_tool('list_notes', {})
-        project_a = next(
-            note for note in initial_result.data if note['title'] == 'Project A'
-        )
-        project_b = next(
-            note for note in initial_result.data if note['title'] == 'Project B'
-        )
-
-        assert project_a['children_count'] == 1
-        assert project_a['descendant_count'] == 1
-        assert project_b['children_count'] is None
-
-        # Move task from A to B
+    with pytest.raises(ToolError, match='not found'):
         await client.call_tool(
             'move_note',
-            {'filename': 'project_a/task.md', 'target_folder': 'project_b'},
+            {'filename': 'nonexistent.md', 'target_folder': 'archive'},
         )
 
-        # Check updated counts
-        updated_result = await client.call_tool('list_notes', {})
-        project_a = next(
-            note for note in updated_result.data if note['title'] == 'Project A'
-        )
-        project_b = next(
-            note for note in updated_result.data if note['title'] == 'Project B'
-        )
 
-        assert project_a['children_count'] is None  # No children left
-        assert project_b['children_count'] == 1
-        assert project_b['descendant_count'] == 1
+async def test_move_note_updates_counts_via_mcp(client, storage):
+    """Test that moving notes updates parent counts via MCP server."""
+    # Create projects with tasks
+    storage.add_note('Project A', 'Project A content', ['projectA'])
+    storage.add_note('Project B', 'Project B content', ['projectB'])
+    storage.add_note('Task', 'Task content', ['task'], parent='project_a')
+
+    # Check initial counts
+    initial_result = await client.call_tool('list_notes', {})
+    notes = by_title(initial_result.data)
+    project_a = notes['Project A']
+    project_b = notes['Project B']
+
+    assert project_a['children_count'] == 1
+    assert project_a['descendant_count'] == 1
+    assert project_b['children_count'] is None
+
+    # Move task from A to B
+    await client.call_tool(
+        'move_note',
+        {'filename': 'project_a/task.md', 'target_folder': 'project_b'},
+    )
+
+    # Check updated counts
+    updated_result = await client.call_tool('list_notes', {})
+    notes = by_title(updated_result.data)
+    project_a = notes['Project A']
+    project_b = notes['Project B']
+
+    assert project_a['children_count'] is None  # No children left
+    assert project_b['children_count'] == 1
+    assert project_b['descendant_count'] == 1
 
 
 # Tests for tag management via MCP server
-@pytest.mark.asyncio
-async def test_add_tags_via_mcp(mcp_server):
+async def test_add_tags_via_mcp(client, storage):
     """Test adding tags to a note via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create a note with initial tags
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Test Note',
-                'content': 'Test content',
-                'tags': ['initial', 'tag'],
-            },
-        )
+    # Create a note with initial tags
+    storage.add_note('Test Note', 'Test content', ['initial', 'tag'])
 
-        # Add new tags
-        result = await client.call_tool(
-            'add_tags', {'filename': 'test_note.md', 'tags': ['new', 'added']}
-        )
+    # Add new tags
+    result = await client.call_tool(
+        'add_tags', {'filename': 'test_note.md', 'tags': ['new', 'added']}
+    )
 
-        assert 'new, added' in result.data
-        assert 'added to note' in result.data
-        assert 'test_note.md' in result.data
+    assert 'new, added' in result.data
+    assert 'added to note' in result.data
+    assert 'test_note.md' in result.data
 
-        # Verify tags were added
-        get_result = await client.call_tool('get_note', {'filename': 'test_note.md'})
-        assert 'Tags: added, initial, new, tag' in get_result.data
+    # Verify tags were added
+    get_result = storage.get_note(filename='test_note.md')
+    assert 'Tags: added, initial, new, tag' in get_result
 
 
-@pytest.mark.asyncio
-async def test_add_tags_avoids_duplicates_via_mcp(mcp_server):
+async def test_add_tags_avoids_duplicates_via_mcp(client, storage):
     """Test that adding existing tags avoids duplicates via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create a note with initial tags
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Test Note',
-                'content': 'Test content',
-                'tags': ['existing', 'tag'],
-            },
-        )
+    # Create a note with initial tags
+    storage.add_note('Test Note', 'Test content', ['existing', 'tag'])
 
-        # Try to add tags, including one that already exists
-        result = await client.call_tool(
-            'add_tags', {'filename': 'test_note.md', 'tags': ['existing', 'new']}
-        )
+    # Try to add tags, including one that already exists
+    result = await client.call_tool(
+        'add_tags', {'filename': 'test_note.md', 'tags': ['existing', 'new']}
+    )
 
-        assert 'existing, new' in result.data
-        assert 'added to note' in result.data
+    assert 'existing, new' in result.data
+    assert 'added to note' in result.data
 
-        # Verify no duplicates
-        get_result = await client.call_tool('get_note', {'filename': 'test_note.md'})
-        content = get_result.data
-        assert content.count('existing') == 1
+    # Verify no duplicates
+    content = storage.get_note(filename='test_note.md')
+    assert content.count('existing') == 1
 
 
-@pytest.mark.asyncio
-async def test_add_tags_to_hierarchical_note_via_mcp(mcp_server):
+async def test_add_tags_to_hierarchical_note_via_mcp(
+    client, storage, parent_with_child
+):
     """Test adding tags to hierarchical notes via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create parent and child notes
-        await client.call_tool(
-            'add_note',
-            {'title': 'Parent Note', 'content': 'Parent content', 'tags': ['parent']},
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Child Note',
-                'content': 'Child content',
-                'tags': ['child'],
-                'parent': 'parent_note',
-            },
-        )
+    # Add tags to child note
+    result = await client.call_tool(
+        'add_tags',
+        {'filename': 'parent_note/child_note.md', 'tags': ['new', 'hierarchical']},
+    )
 
-        # Add tags to child note
-        result = await client.call_tool(
-            'add_tags',
-            {'filename': 'parent_note/child_note.md', 'tags': ['new', 'hierarchical']},
-        )
+    assert 'new, hierarchical' in result.data
+    assert 'parent_note/child_note.md' in result.data
 
-        assert 'new, hierarchical' in result.data
-        assert 'parent_note/child_note.md' in result.data
-
-        # Verify tags were added to child
-        get_result = await client.call_tool(
-            'get_note', {'filename': 'parent_note/child_note.md'}
-        )
-        assert 'Tags: child, hierarchical, new' in get_result.data
+    # Verify tags were added to child
+    get_result = storage.get_note(filename='parent_note/child_note.md')
+    assert 'Tags: child, hierarchical, new' in get_result
 
 
-@pytest.mark.asyncio
-async def test_add_tags_not_found_via_mcp(mcp_server):
+async def test_add_tags_not_found_via_mcp(client):
     """Test adding tags to a non-existent note via MCP server."""
-    async with Client(mcp_server) as client:
-        with pytest.raises(Exception) as exc_info:
-            await client.call_tool(
-                'add_tags', {'filename': 'non_existent.md', 'tags': ['new']}
-            )
-        assert 'not found' in str(exc_info.value)
+    with pytest.raises(ToolError, match='not found'):
+        await client.call_tool(
+            'add_tags', {'filename': 'non_existent.md', 'tags': ['new']}
+        )
 
 
-@pytest.mark.asyncio
-async def test_remove_tags_via_mcp(mcp_server):
+async def test_remove_tags_via_mcp(client, storage):
     """Test removing tags from a note via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create a note with multiple tags
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Test Note',
-                'content': 'Test content',
-                'tags': ['tag1', 'tag2', 'tag3', 'tag4'],
-            },
-        )
+    # Create a note with multiple tags
+    storage.add_note('Test Note', 'Test content', ['tag1', 'tag2', 'tag3', 'tag4'])
 
-        # Remove some tags
-        result = await client.call_tool(
-            'remove_tags', {'filename': 'test_note.md', 'tags': ['tag2', 'tag4']}
-        )
+    # Remove some tags
+    result = await client.call_tool(
+        'remove_tags', {'filename': 'test_note.md', 'tags': ['tag2', 'tag4']}
+    )
 
-        assert 'tag2, tag4' in result.data
-        assert 'removed from note' in result.data
-        assert 'test_note.md' in result.data
+    assert 'tag2, tag4' in result.data
+    assert 'removed from note' in result.data
+    assert 'test_note.md' in result.data
 
-        # Verify tags were removed
-        get_result = await client.call_tool('get_note', {'filename': 'test_note.md'})
-        assert 'Tags: tag1, tag3' in get_result.data
+    # Verify tags were removed
+    get_result = storage.get_note(filename='test_note.md')
+    assert 'Tags: tag1, tag3' in get_result
 
 
-@pytest.mark.asyncio
-async def test_remove_tags_nonexistent_via_mcp(mcp_server):
+async def test_remove_tags_nonexistent_via_mcp(client, storage):
     """Test removing non-existent tags via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create a note with some tags
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Test Note',
-                'content': 'Test content',
-                'tags': ['existing', 'tag'],
-            },
-        )
+    # Create a note with some tags
+    storage.add_note('Test Note', 'Test content', ['existing', 'tag'])
 
-        # Try to remove tags that don't exist
-        result = await client.call_tool(
-            'remove_tags',
-            {'filename': 'test_note.md', 'tags': ['nonexistent', 'missing']},
-        )
+    # Try to remove tags that don't exist
+    result = await client.call_tool(
+        'remove_tags',
+        {'filename': 'test_note.md', 'tags': ['nonexistent', 'missing']},
+    )
 
-        assert 'nonexistent, missing' in result.data
-        assert 'removed from note' in result.data
+    assert 'nonexistent, missing' in result.data
+    assert 'removed from note' in result.data
 
-        # Verify existing tags are unchanged
-        get_result = await client.call_tool('get_note', {'filename': 'test_note.md'})
-        assert 'Tags: existing, tag' in get_result.data
+    # Verify existing tags are unchanged
+    get_result = storage.get_note(filename='test_note.md')
+    assert 'Tags: existing, tag' in get_result
 
 
-@pytest.mark.asyncio
-async def test_remove_all_tags_via_mcp(mcp_server):
+async def test_remove_all_tags_via_mcp(client, storage):
     """Test removing all tags from a note via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create a note with tags
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Test Note',
-                'content': 'Test content',
-                'tags': ['tag1', 'tag2'],
-            },
-        )
+    # Create a note with tags
+    storage.add_note('Test Note', 'Test content', ['tag1', 'tag2'])
 
-        # Remove all tags
-        result = await client.call_tool(
-            'remove_tags', {'filename': 'test_note.md', 'tags': ['tag1', 'tag2']}
-        )
+    # Remove all tags
+    result = await client.call_tool(
+        'remove_tags', {'filename': 'test_note.md', 'tags': ['tag1', 'tag2']}
+    )
 
-        assert 'tag1, tag2' in result.data
-        assert 'removed from note' in result.data
+    assert 'tag1, tag2' in result.data
+    assert 'removed from note' in result.data
 
-        # Verify all tags are gone
-        get_result = await client.call_tool('get_note', {'filename': 'test_note.md'})
-        assert 'Tags: \n\n' in get_result.data
+    # Verify all tags are gone
+    assert 'Tags: \n\n' in storage.get_note(filename='test_note.md')
 
-        # Verify index is updated
-        list_result = await client.call_tool('list_notes', {})
-        test_note = next(
-            note for note in list_result.data if note['title'] == 'Test Note'
-        )
-        assert test_note['tags'] == []
+    # Verify index is updated
+    test_note = by_title(storage.list_notes())['Test Note']
+    assert test_note['tags'] == []
 
 
-@pytest.mark.asyncio
-async def test_remove_tags_from_hierarchical_note_via_mcp(mcp_server):
+async def test_remove_tags_from_hierarchical_note_via_mcp(client, storage):
     """Test removing tags from hierarchical notes via MCP server."""
-    async with Client(mcp_server) as client:
-        # Create parent and child notes
-        await client.call_tool(
-            'add_note',
-            {'title': 'Parent Note', 'content': 'Parent content', 'tags': ['parent']},
-        )
-        await client.call_tool(
-            'add_note',
-            {
-                'title': 'Child Note',
-                'content': 'Child content',
-                'tags': ['child', 'draft', 'review'],
-                'parent': 'parent_note',
-            },
-        )
+    # Create parent and child notes
+    storage.add_note('Parent Note', 'Parent content', ['parent'])
+    storage.add_note(
+        'Child Note',
+        'Child content',
+        ['child', 'draft', 'review'],
+        parent='parent_note',
+    )
 
-        # Remove tags from child note
-        result = await client.call_tool(
-            'remove_tags',
-            {'filename': 'parent_note/child_note.md', 'tags': ['draft', 'review']},
-        )
+    # Remove tags from child note
+    result = await client.call_tool(
+        'remove_tags',
+        {'filename': 'parent_note/child_note.md', 'tags': ['draft', 'review']},
+    )
 
-        assert 'draft, review' in result.data
-        assert 'parent_note/child_note.md' in result.data
+    assert 'draft, review' in result.data
+    assert 'parent_note/child_note.md' in result.data
 
-        # Verify tags were removed from child
-        get_result = await client.call_tool(
-            'get_note', {'filename': 'parent_note/child_note.md'}
-        )
-        assert 'Tags: child\n\n' in get_result.data
+    # Verify tags were removed from child
+    assert 'Tags: child\n\n' in storage.get_note(filename='parent_note/child_note.md')
 
-        # Verify index is updated
-        child_list_result = await client.call_tool(
-            'list_notes', {'parent': 'parent_note'}
-        )
-        child_note = next(
-            note for note in child_list_result.data if note['title'] == 'Child Note'
-        )
-        assert child_note['tags'] == ['child']
+    # Verify index is updated
+    child_note = by_title(storage.list_notes(parent='parent_note'))['Child Note']
+    assert child_note['tags'] == ['child']
 
 
-@pytest.mark.asyncio
-async def test_remove_tags_not_found_via_mcp(mcp_server):
+async def test_remove_tags_not_found_via_mcp(client):
     """Test removing tags from a non-existent note via MCP server."""
-    async with Client(mcp_server) as client:
-        with pytest.raises(Exception) as exc_info:
-            await client.call_tool(
-                'remove_tags', {'filename': 'non_existent.md', 'tags': ['tag']}
-            )
-        assert 'not found' in str(exc_info.value)
-
-
-@pytest.mark.asyncio
-async def test_tag_operations_preserve_content_via_mcp(mcp_server):
-    """Test that tag operations preserve note title and content via MCP server."""
-    async with Client(mcp_server) as client:
-        original_title = 'Complex Title with Special Characters!'
-        original_content = (
-            'This is some complex content\nwith multiple lines\n\nand empty lines.'
-        )
-
-        # Create note
+    with pytest.raises(ToolError, match='not found'):
         await client.call_tool(
-            'add_note',
-            {
-                'title': original_title,
-                'content': original_content,
-                'tags': ['initial'],
-            },
+            'remove_tags', {'filename': 'non_existent.md', 'tags': ['tag']}
         )
 
-        # Add tags
-        await client.call_tool(
-            'add_tags',
-            {
-                'filename': 'complex_title_with_special_characters.md',
-                'tags': ['added'],
-            },
-        )
 
-        # Remove tags
-        await client.call_tool(
-            'remove_tags',
-            {
-                'filename': 'complex_title_with_special_characters.md',
-                'tags': ['initial'],
-            },
+async def test_tag_operations_preserve_content_via_mcp(client, storage):
+    """Test that tag operations preserve note title and content via MCP server."""
+    original_title = 'Complex Title with Special Characters!'
+    original_content = (
+        'This is some complex content\nwith multiple lines\n\nand empty lines.'
+    )
+
+    # Create note
+    storage.add_note(original_title, original_content, ['initial'])
+
+    # Add tags
+    await client.call_tool(
+        'add_tags',
+        {
+            'filename': 'complex_title_with_special_characters.md',
+            'tags': ['added'],
+        },
+    )
+
+    # Remove tags
+    await client.call_tool(
+        'remove_tags',
+        {
+            'filename': 'complex_title_with_special_characters.md',
+            'tags': ['initial'],
+        },
+    )
+
+    # Check that title and content are preserved
+    final_content = storage.get_note(
+        filename='complex_title_with_special_characters.md'
+    )
+    assert f'# {original_title}' in final_content
+    assert original_content in final_content
+    assert 'Tags: added' in final_content
+
+
+async def test_concurrent_tool_calls(client, storage):
+    """Test that overlapping tool calls all complete and keep the index consistent."""
+    storage.add_note('Parent', 'Parent', [])
+    await asyncio.gather(
+        *(
+            client.call_tool(
+                'add_note',
+                {'title': f'Child {i}', 'content': 'Child', 'parent': 'parent'},
+            )
+            for i in range(10)
         )
+    )
 
-        # Check that title and content are preserved
-        final_result = await client.call_tool(
-            'get_note', {'filename': 'complex_title_with_special_characters.md'}
-        )
-        final_content = final_result.data
-        assert f'# {original_title}' in final_content
-        assert original_content in final_content
-        assert 'Tags: added' in final_content
+    result = storage.list_notes()
+    assert result[0]['children_count'] == 10
+
+    result = storage.list_notes(parent='parent')
+    assert len(result) == 10
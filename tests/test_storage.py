@@ -1,27 +1,86 @@
 import json
-import tempfile
-from pathlib import Path
+import os
+from contextlib import contextmanager
 
 import pytest
 
+from mcp_notes import storage as storage_module
 from mcp_notes.storage import Storage
 
 
 @pytest.fixture
-def temp_dir():
-    with tempfile.TemporaryDirectory() as td:
-        yield Path(td)
+def storage(tmp_path):
+    return Storage(tmp_path)
 
 
 @pytest.fixture
-def storage(temp_dir):
-    return Storage(temp_dir)
-
-
-def test_init(temp_dir):
-    storage = Storage(temp_dir)
-    assert storage.directory == temp_dir
-    assert temp_dir.exists()
+def written_indexes(storage, monkeypatch):
+    """Record the path of every index file that storage writes to disk."""
+    written = []
+    write_index = storage._write_index
+    monkeypatch.setattr(
+        storage,
+        '_write_index',
+        lambda path, index: written.append(path) or write_index(path, index),
+    )
+    return written
+
+
+@contextmanager
+def assert_not_rewritten(path):
+    """Check that the file at path isn't written inside the with block.
+
+    The file's mtime is first moved a second into the past, so that a
+    rewrite within the same clock tick still changes it.
+    """
+    before = path.stat().st_mtime_ns
+    os.utime(path, ns=(before - 10**9, before - 10**9))
+    stamp = path.stat().st_mtime_ns
+    yield
+    assert path.stat().st_mtime_ns == stamp
+
+
+def stored_counts(storage):
+    """Map each note's filename to its stored (children, descendants) counts."""
+    counts = {}
+    for index_path in storage.directory.rglob('notes_index.json'):
+        folder = index_path.parent.relative_to(storage.directory).as_posix()
+        for note in storage.list_notes(None if folder == '.' else folder):
+            counts[note['filename']] = (
+                note.get('children_count', 0),
+                note.get('descendant_count', 0),
+            )
+    return counts
+
+
+def recounted_counts(storage):
+    """Recount every note's (children, descendants) from the index files on disk."""
+
+    def children(folder):
+        index_path = storage.directory / folder / 'notes_index.json'
+        if not index_path.exists():
+            return []
+        return [
+            data['filename'] for data in json.loads(index_path.read_text()).values()
+        ]
+
+    def count(filename):
+        child_filenames = children(filename[:-3])
+        return len(child_filenames), sum(
+            1 + count(child)[1] for child in child_filenames
+        )
+
+    counts = {}
+    for index_path in storage.directory.rglob('notes_index.json'):
+        for data in json.loads(index_path.read_text()).values():
+            counts[data['filename']] = count(data['filename'])
+    return counts
+
+
+def test_init(tmp_path):
+    storage = Storage(tmp_path)
+    assert storage.directory == tmp_path
+    assert tmp_path.exists()
 
 
 def test_add_note_basic(storage):
@@ -66,6 +125,18 @@ def test_add_note_duplicate_names(storage):
     assert path2.name == 'duplicate_1.md'
 
 
+def test_add_note_skips_taken_numbered_names(storage):
+    (storage.directory / 'duplicate_2.md').write_text('Not in the index')
+    paths = [storage.add_note('Duplicate', 'Content', []) for _ in range(4)]
+
+    assert [path.name for path in paths] == [
+        'duplicate.md',
+        'duplicate_1.md',
+        'duplicate_3.md',
+        'duplicate_4.md',
+    ]
+
+
 def test_add_note_updates_index(storage):
     title = 'Test Note'
     content = 'Content'
@@ -84,6 +155,152 @@ def test_add_note_updates_index(storage):
     assert index[title]['tags'] == tags
 
 
+def test_index_cache_reused_between_loads(storage):
+    storage.add_note('Test Note', 'Content', ['test'])
+    # Old enough for its stamp to be trusted
+    os.utime(storage.index_file, ns=(0, 0))
+
+    assert storage._load_index() is storage._load_index()
+
+
+def test_index_cache_rereads_recently_modified_index(storage):
+    storage.add_note('Test Note', 'Content', ['todo'])
+    assert storage.list_notes()[0]['tags'] == ['todo']
+
+    # Same size and mtime, as a rewrite within one timestamp tick would leave
+    stat = storage.index_file.stat()
+    index = json.loads(storage.index_file.read_text())
+    index['Test Note']['tags'] = ['done']
+    storage.index_file.write_text(json.dumps(index, separators=(',', ':')))
+    os.utime(storage.index_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert storage.index_file.stat().st_size == stat.st_size
+
+    assert storage.list_notes()[0]['tags'] == ['done']
+
+
+def test_index_cache_picks_up_external_changes(storage):
+    storage.add_note('Test Note', 'Content', ['test'])
+    assert [note['title'] for note in storage.list_notes()] == ['Test Note']
+
+    # Rewrite the index behind the storage's back
+    index_path = storage.directory / 'notes_index.json'
+    with open(index_path, 'w') as f:
+        json.dump(
+            {'Renamed Note': {'filename': 'test_note.md', 'tags': ['external']}}, f
+        )
+
+    notes = storage.list_notes()
+    assert [note['title'] for note in notes] == ['Renamed Note']
+    assert notes[0]['tags'] == ['external']
+
+
+def test_filename_lookup_tracks_index_changes(storage):
+    storage.add_note('First', 'Content', [])
+    assert storage.update_note(filename='first.md', content='New', tags=[])
+
+    # The lookup built for the first update must see notes added afterwards
+    storage.add_note('Second', 'Content', [])
+    assert storage.update_note(filename='second.md', content='New', tags=['x'])
+    assert storage.delete_note(filename='first.md')
+    assert not storage.update_note(filename='first.md', content='New', tags=[])
+
+
+def test_index_write_leaves_no_temporary_file(storage):
+    """Test that index writes replace the index without leaving temp files behind."""
+    storage.add_note('Parent', 'Parent content', [])
+    storage.add_note('Child', 'Child content', [], 'parent')
+
+    assert sorted(p.name for p in storage.directory.iterdir()) == [
+        'notes_index.json',
+        'parent',
+        'parent.md',
+    ]
+    assert sorted(p.name for p in (storage.directory / 'parent').iterdir()) == [
+        'child.md',
+        'notes_index.json',
+    ]
+
+
+def test_failed_index_write_removes_temporary_file(storage, monkeypatch):
+    storage.add_note('Parent', 'Parent content', [])
+
+    def fail(fd, data):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(os, 'write', fail)
+    with pytest.raises(OSError, match='disk full'):
+        storage.add_note('Child', 'Child content', [], 'parent')
+    monkeypatch.undo()
+
+    assert sorted(p.name for p in (storage.directory / 'parent').iterdir()) == [
+        'child.md'
+    ]
+
+
+def test_batch_defers_index_writes(storage):
+    storage.add_note('Project', 'Project content', ['project'])
+    child_index_path = storage.directory / 'project' / 'notes_index.json'
+
+    with storage.batch():
+        storage.add_note('Task 1', 'First task', ['task'], parent='project')
+        storage.add_note('Task 2', 'Second task', ['task'], parent='project')
+
+        # Reads inside the batch see the pending changes
+        assert len(storage.list_notes(parent='project')) == 2
+        assert not child_index_path.exists()
+
+    with open(child_index_path) as f:
+        child_index = json.load(f)
+    assert set(child_index) == {'Task 1', 'Task 2'}
+
+    project = storage.list_notes()[0]
+    assert project['children_count'] == 2
+
+
+def test_batch_counts_with_relative_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    storage = Storage('.')
+
+    with storage.batch():
+        storage.add_note('Task', 'Task content', [], parent='project')
+        storage.add_note('Project', 'Project content', [])
+
+    project = storage.list_notes()[0]
+    assert project['children_count'] == 1
+    assert project['descendant_count'] == 1
+
+
+def test_move_note_writes_each_index_once(storage, written_indexes):
+    storage.add_note('Project', 'Project content', [])
+    storage.add_note('Task', 'Task content', [], parent='project')
+    storage.add_note('Archive', 'Archive content', [])
+    storage.add_note('Old', 'Old content', [], parent='archive')
+
+    written_indexes.clear()
+    storage.move_note(filename='project/task.md', target_folder='archive')
+
+    # The root index (counts of both parents) and the archive index; the
+    # emptied project folder is removed without writing its index
+    assert sorted(written_indexes) == [
+        str(storage.directory / 'archive' / 'notes_index.json'),
+        str(storage.directory / 'notes_index.json'),
+    ]
+
+
+def test_batch_with_directory_cleanup(storage):
+    storage.add_note('Project', 'Project content', [])
+
+    with storage.batch():
+        storage.add_note('Task', 'Task content', [], parent='project')
+        storage.move_note(filename='project/task.md')
+
+    assert not (storage.directory / 'project').exists()
+    assert {note['filename'] for note in storage.list_notes()} == {
+        'project.md',
+        'task.md',
+    }
+
+
 def test_get_note_by_filename(storage):
     title = 'Test Note'
     content = 'Test content'
@@ -96,11 +313,59 @@ def test_get_note_by_filename(storage):
     assert result == expected
 
 
+def test_notes_are_stored_as_utf8(storage):
+    storage.add_note('Café', 'Crème brûlée → 🍮', ['dessert'])
+
+    note_path = storage.directory / 'caf.md'
+    expected = '# Café\nTags: dessert\n\nCrème brûlée → 🍮'
+    assert note_path.read_bytes() == expected.encode('utf-8')
+    assert storage.get_note(filename='caf.md') == expected
+
+
+def test_get_note_sees_same_size_rewrites(storage):
+    storage.add_note('Test Note', 'Content A', ['test'])
+    assert storage.get_note(filename='test_note.md').endswith('Content A')
+
+    # Same length as before, so only explicit invalidation can catch it
+    storage.update_note(filename='test_note.md', content='Content B', tags=['test'])
+    assert storage.get_note(filename='test_note.md').endswith('Content B')
+
+    storage.delete_note(filename='test_note.md')
+    assert storage.get_note(filename='test_note.md') is None
+
+
+def test_get_note_sees_external_rewrite_with_same_stamp(storage):
+    storage.add_note('Test Note', 'Content A', ['test'])
+    note_path = storage.directory / 'test_note.md'
+    assert storage.get_note(filename='test_note.md').endswith('Content A')
+
+    # Same size and mtime, as a rewrite within one timestamp tick would leave
+    stat = note_path.stat()
+    note_path.write_text(note_path.read_text().replace('Content A', 'Content B'))
+    os.utime(note_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert storage.get_note(filename='test_note.md').endswith('Content B')
+
+
 def test_get_note_not_found(storage):
     result = storage.get_note(filename='non_existent.md')
     assert result is None
 
 
+def test_paths_outside_directory_rejected(storage):
+    """Test that note paths can't escape the notes directory."""
+    storage.add_note('Test Note', 'Test content', [])
+
+    with pytest.raises(ValueError, match='Invalid note path'):
+        storage.get_note(filename='../test_note.md')
+    with pytest.raises(ValueError, match='Invalid note path'):
+        storage.delete_note(filename='/etc/passwd')
+    with pytest.raises(ValueError, match='Invalid note path'):
+        storage.add_note('Escaped', 'Content', [], parent='sub/../..')
+    with pytest.raises(ValueError, match='Invalid note path'):
+        storage.move_note(filename='test_note.md', target_folder='..')
+
+
 def test_list_notes_empty(storage):
     result = storage.list_notes()
     assert result == []
@@ -126,6 +391,16 @@ def test_list_notes(storage):
     assert result[1]['tags'] == ['tag2', 'tag3']
 
 
+def test_list_notes_result_is_independent_of_cache(storage):
+    storage.add_note('First Note', 'Content 1', ['tag1'])
+    storage.add_note('Second Note', 'Content 2', ['tag2'])
+
+    result = storage.list_notes()
+    result.clear()
+
+    assert len(storage.list_notes()) == 2
+
+
 def test_delete_note_by_filename(storage):
     title = 'Test Note'
     storage.add_note(title, 'Content', ['test'])
@@ -326,6 +601,18 @@ def test_directory_cleanup_on_last_note_deletion(storage):
     assert not parent_dir.exists()
 
 
+def test_directory_cleanup_keeps_folder_with_other_entries(storage):
+    storage.add_note('Parent Note', 'Parent content', [])
+    storage.add_note('Child Note', 'Child content', [], parent='parent_note')
+    storage.add_note('Grandchild', 'Content', [], parent='parent_note/child_note')
+
+    storage.delete_note(filename='parent_note/child_note.md')
+
+    # The grandchild's folder is still there, so parent_note can't go
+    assert (storage.directory / 'parent_note' / 'child_note').is_dir()
+    assert storage.list_notes(parent='parent_note') == []
+
+
 def test_list_notes_hierarchical(storage):
     # Create parent and child notes
     storage.add_note('Parent Note', 'Parent content', ['parent'])
@@ -448,6 +735,49 @@ def test_descendant_count_nested_hierarchy(storage):
     assert parent_note['descendant_count'] == 1
 
 
+def test_descendant_count_four_levels(storage):
+    # Descendants more than two levels down are counted too
+    storage.add_note('A', 'A content', [])
+    storage.add_note('B', 'B content', [], parent='a')
+    storage.add_note('C', 'C content', [], parent='a/b')
+    storage.add_note('D', 'D content', [], parent='a/b/c')
+
+    a_note = storage.list_notes()[0]
+    assert a_note['children_count'] == 1
+    assert a_note['descendant_count'] == 3
+
+    with storage.batch():
+        storage.add_note('E', 'E content', [], parent='a/b/c')
+        storage.delete_note(filename='a/b/c/d.md')
+        storage.add_note('F', 'F content', [], parent='a/b/c/e')
+
+    a_note = storage.list_notes()[0]
+    assert a_note['descendant_count'] == 4
+    b_note = storage.list_notes(parent='a')[0]
+    assert b_note['children_count'] == 1
+    assert b_note['descendant_count'] == 3
+
+
+def test_count_updates_on_deleting_note_with_children(storage):
+    # Deleting a note drops its whole subtree from the ancestors' counts
+    storage.add_note('A', 'A content', [])
+    storage.add_note('B', 'B content', [], parent='a')
+    storage.add_note('C', 'C content', [], parent='a/b')
+    storage.add_note('D', 'D content', [], parent='a/b/c')
+    storage.add_note('E', 'E content', [], parent='a')
+
+    storage.delete_note(filename='a/b.md')
+
+    a_note = storage.list_notes()[0]
+    assert a_note['children_count'] == 1
+    assert a_note['descendant_count'] == 1
+
+    # Changes under the left-over folder no longer count towards 'a'
+    storage.delete_note(filename='a/b/c/d.md')
+    a_note = storage.list_notes()[0]
+    assert a_note['descendant_count'] == 1
+
+
 def test_count_updates_on_deletion(storage):
     # Create parent with children
     storage.add_note('Project', 'Project content', ['project'])
@@ -707,6 +1037,67 @@ def test_move_note_updates_references(storage):
     assert 'task.md' not in other_content.replace('archive/task.md', '')
 
 
+def test_move_note_updates_references_without_search_tool(storage, monkeypatch):
+    """Test that references are updated by scanning notes when rg/grep are missing."""
+    monkeypatch.setattr('mcp_notes.storage._search_command', lambda: None)
+    storage.add_note('Main', 'See also task.md for details', ['main'])
+    storage.add_note('Task', 'Task content', ['task'])
+    storage.add_note('Archive', 'Archive content', ['archive'])
+    storage.add_note('Child', 'Child of task.md', [], parent='archive')
+
+    storage.move_note(filename='task.md', target_folder='archive')
+
+    assert 'See also archive/task.md' in storage.get_note(filename='main.md')
+    assert 'Child of archive/task.md' in storage.get_note(filename='archive/child.md')
+
+
+def test_move_notes_updates_references_to_all_moved_notes(storage):
+    """Test that a bulk move updates references to every moved note."""
+    storage.add_note('Main', 'See task.md and plan.md', ['main'])
+    storage.add_note('Task', 'Task content', ['task'])
+    storage.add_note('Plan', 'Plan content', ['plan'])
+    storage.add_note('Archive', 'Archive content', ['archive'])
+    storage.add_note('Done', 'Done content', ['done'])
+
+    new_filenames = storage.move_notes(
+        [('task.md', 'archive'), ('plan.md', 'archive'), ('archive/task.md', 'done')]
+    )
+
+    assert new_filenames == ['archive/task.md', 'archive/plan.md', 'done/task.md']
+    main_content = storage.get_note(filename='main.md')
+    assert 'See done/task.md and archive/plan.md' in main_content
+    assert [note['filename'] for note in storage.list_notes(parent='archive')] == [
+        'archive/plan.md'
+    ]
+
+
+def test_move_notes_leaves_moved_notes_own_filenames(storage):
+    """Test that a moved note keeps mentions of itself, like move_note does."""
+    storage.add_note('Task', 'This is task.md, see plan.md', [])
+    storage.add_note('Plan', 'This is plan.md, see task.md', [])
+    storage.add_note('Archive', 'Archive content', [])
+
+    storage.move_notes([('task.md', 'archive'), ('plan.md', 'archive')])
+
+    task = storage.get_note(filename='archive/task.md')
+    assert task.endswith('This is task.md, see archive/plan.md')
+    plan = storage.get_note(filename='archive/plan.md')
+    assert plan.endswith('This is plan.md, see archive/task.md')
+
+
+def test_move_notes_failure_keeps_references_to_completed_moves(storage):
+    """Test that a bulk move failing part way still updates references."""
+    storage.add_note('Main', 'See task.md', ['main'])
+    storage.add_note('Task', 'Task content', ['task'])
+    storage.add_note('Archive', 'Archive content', ['archive'])
+
+    with pytest.raises(ValueError, match='not found'):
+        storage.move_notes([('task.md', 'archive'), ('missing.md', 'archive')])
+
+    assert storage.get_note(filename='archive/task.md') is not None
+    assert 'See archive/task.md' in storage.get_note(filename='main.md')
+
+
 def test_move_note_handles_duplicate_names(storage):
     """Test that moving a note handles duplicate names in target folder."""
     # Create notes with same title in different locations
@@ -760,6 +1151,38 @@ def test_move_note_updates_parent_counts(storage):
     assert project_b['descendant_count'] == 1
 
 
+def test_move_note_within_shared_ancestor_updates_counts(storage):
+    """Test moving a note between two folders under the same ancestor."""
+    storage.add_note('Root', 'Root content', [])
+    storage.add_note('Branch A', 'A content', [], parent='root')
+    storage.add_note('Branch B', 'B content', [], parent='root')
+    storage.add_note('Leaf', 'Leaf content', [], parent='root/branch_a')
+
+    storage.move_note(filename='root/branch_a/leaf.md', target_folder='root/branch_b')
+
+    root = storage.list_notes()[0]
+    assert root['children_count'] == 2
+    assert root['descendant_count'] == 3
+
+    branches = {note['title']: note for note in storage.list_notes(parent='root')}
+    assert 'children_count' not in branches['Branch A']
+    assert branches['Branch B']['children_count'] == 1
+    assert branches['Branch B']['descendant_count'] == 1
+
+
+def test_move_note_up_into_its_ancestor_counts_it_once(storage):
+    """Test moving a note into an ancestor folder that still contains it."""
+    storage.add_note('A', 'A content', [])
+    storage.add_note('B', 'B content', [], parent='a')
+    storage.add_note('B', 'Inner B content', [], parent='a/b')
+    storage.delete_note(filename='a/b.md')
+
+    storage.move_note(filename='a/b/b.md', target_folder='a')
+
+    assert storage.list_notes()[0]['descendant_count'] == 1
+    assert stored_counts(storage) == recounted_counts(storage)
+
+
 def test_move_note_cleans_up_empty_directories(storage):
     """Test that moving the last note from a folder cleans up the empty directory."""
     # Create hierarchy
@@ -893,6 +1316,59 @@ def test_add_tags_avoids_duplicates(storage):
     assert set(test_note['tags']) == {'existing', 'tag', 'new'}
 
 
+def test_unchanged_tags_skip_rewrite(storage):
+    """Test that adding present tags or removing absent ones doesn't rewrite the note."""
+    storage.add_note('Test Note', 'Test content', ['existing', 'tag'])
+    with assert_not_rewritten(storage.directory / 'test_note.md'):
+        assert storage.add_tags(filename='test_note.md', tags_to_add=['tag']) is True
+        assert (
+            storage.remove_tags(filename='test_note.md', tags_to_remove=['x']) is True
+        )
+
+
+def test_unchanged_update_skips_rewrite(storage):
+    """Test that updating a note to its current content and tags doesn't rewrite it."""
+    storage.add_note('Test Note', 'Test content', ['tag'])
+    with assert_not_rewritten(storage.directory / 'test_note.md'):
+        assert storage.update_note(
+            filename='test_note.md', content='Test content', tags=['tag']
+        )
+
+    assert storage.update_note(filename='test_note.md', content='Test', tags=['tag'])
+    assert storage.get_note(filename='test_note.md') == '# Test Note\nTags: tag\n\nTest'
+
+
+def test_content_update_reads_note_only_if_size_matches(storage, monkeypatch):
+    storage.add_note('Test Note', 'Test content', ['tag'])
+
+    read = []
+    read_note_file = storage_module._read_note_file
+    monkeypatch.setattr(
+        storage_module,
+        '_read_note_file',
+        lambda path: read.append(path) or read_note_file(path),
+    )
+    storage.update_note(filename='test_note.md', content='New content', tags=['tag'])
+    storage.update_note(filename='test_note.md', content='Newer content', tags=['tag'])
+    assert read == []
+
+    # Same size as the current text, which has to be compared
+    storage.update_note(filename='test_note.md', content='Older content', tags=['tag'])
+    assert len(read) == 1
+    assert storage.get_note(filename='test_note.md').endswith('Older content')
+
+
+def test_content_only_update_skips_index_write(storage, written_indexes):
+    storage.add_note('Test Note', 'Test content', ['tag'])
+
+    written_indexes.clear()
+    storage.update_note(filename='test_note.md', content='New content', tags=['tag'])
+    assert written_indexes == []
+
+    storage.update_note(filename='test_note.md', content='New content', tags=['new'])
+    assert written_indexes == [str(storage.directory / 'notes_index.json')]
+
+
 def test_add_tags_to_empty_tags(storage):
     """Test adding tags to a note that has no existing tags."""
     # Create a note with no tags